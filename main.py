@@ -23,6 +23,12 @@ from ui.pages.calendar_page import CalendarPage
 from ui.pages.shipping_order_page import ShippingOrderPage
 from ui.pages.hirakata_pickup_page import HirakataPickupPage
 
+@st.cache_resource(show_spinner=False)
+def _get_transport_db(customer: str) -> CustomerDatabaseManager:
+    """配送便用の顧客別DB接続（エンジン・接続プールを再実行間で共有）"""
+    return CustomerDatabaseManager(customer)
+
+
 class ProductionPlanningApp:
     """生産計画アプリケーション - メイン制御クラス"""
     
@@ -93,13 +99,14 @@ class ProductionPlanningApp:
 
     def _initialize_pages(self, customer: str):
         """顧客別にページを初期化"""
-        # ✅ 顧客別にTransportServiceを作成
+        # ✅ 顧客別にTransportServiceを作成（DB接続は顧客ごとにキャッシュしたものを使用）
+        transport_db = _get_transport_db(customer)
         if customer == 'tiera':
-            self.transport_service = TieraTransportService(self.db)
+            self.transport_service = TieraTransportService(transport_db)
             transport_page = TieraTransportPage(self.transport_service, self.auth_service)
         else:
             # Kubota様は従来のTransportService
-            self.transport_service = TransportService(self.db)
+            self.transport_service = TransportService(transport_db)
             transport_page = TransportPage(self.transport_service, self.auth_service)
 
         # ページ初期化
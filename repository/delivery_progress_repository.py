@@ -1,6 +1,6 @@
 # app/repository/delivery_progress_repository.py
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 from typing import List, Dict, Any, Optional
 from datetime import date, datetime, time
 import pandas as pd
@@ -344,6 +344,71 @@ class DeliveryProgressRepository:
         finally:
             session.close()
     
+    def bulk_update_planned_quantity(self, updates: List[Dict[str, Any]]) -> int:
+        """
+        計画数量（planned_quantity）を一括更新（1トランザクション・1回のexecutemany）
+        
+        save_loading_plan と同様に、(製品ID, 積載日) ごとに先頭の1レコード（最小ID）のみ更新する。
+        同じ製品・日付の注文が複数行あっても計画数を重複して計上しない。
+        既存レコードがない組み合わせは新規作成しない。
+        
+        Args:
+            updates: [{'product_id': 製品ID, 'delivery_date': 積載日, 'planned_quantity': 計画数}, ...]
+        
+        Returns:
+            int: 更新されたレコード数
+        """
+        if not updates:
+            return 0
+        
+        session = self.db.get_session()
+        
+        try:
+            # (製品ID, 積載日) ごとの更新対象レコードIDを1回のクエリで取得
+            target_query = text("""
+                SELECT product_id, DATE(delivery_date) AS delivery_day, MIN(id) AS progress_id
+                FROM delivery_progress
+                WHERE product_id IN :product_ids
+                GROUP BY product_id, DATE(delivery_date)
+            """).bindparams(bindparam('product_ids', expanding=True))
+            
+            product_ids = sorted({u['product_id'] for u in updates})
+            target_ids = {
+                (row.product_id, str(row.delivery_day)[:10]): row.progress_id
+                for row in session.execute(target_query, {'product_ids': product_ids})
+            }
+            
+            params = []
+            for u in updates:
+                progress_id = target_ids.get((u['product_id'], str(u['delivery_date'])[:10]))
+                if progress_id is not None:
+                    params.append({'progress_id': progress_id, 'planned_quantity': u['planned_quantity']})
+            
+            if not params:
+                return 0
+            
+            query = text("""
+                UPDATE delivery_progress
+                SET planned_quantity = :planned_quantity,
+                    status = CASE 
+                        WHEN shipped_quantity >= order_quantity THEN '出荷完了'
+                        WHEN shipped_quantity > 0 THEN '一部出荷'
+                        ELSE '計画済'
+                    END
+                WHERE id = :progress_id
+            """)
+            
+            session.execute(query, params)
+            session.commit()
+            return len(params)
+            
+        except SQLAlchemyError as e:
+            session.rollback()
+            print(f"計画数量一括更新エラー: {e}")
+            raise
+        finally:
+            session.close()
+    
     def create_delivery_progress(self, progress_data: Dict[str, Any]) -> int:
         """
         納入進度を新規作成
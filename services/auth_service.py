@@ -1,14 +1,25 @@
 # app/services/auth_service.py
 import hashlib
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 import pandas as pd
 import logging
 
 # ロガー設定
 logger = logging.getLogger(__name__)
 
+# 権限の一括削除（IN句は渡された件数に合わせて展開）
+_DELETE_PAGE_PERMISSIONS_IN = text("""
+    DELETE FROM page_permissions
+    WHERE role_id = :role_id AND page_name IN :page_names
+""").bindparams(bindparam('page_names', expanding=True))
+
+_DELETE_TAB_PERMISSIONS_IN = text("""
+    DELETE FROM tab_permissions
+    WHERE role_id = :role_id AND page_name = :page_name AND tab_name IN :tab_names
+""").bindparams(bindparam('tab_names', expanding=True))
+
 class AuthService:
     """認証・権限管理サービス"""
 
@@ -89,6 +100,31 @@ class AuthService:
         finally:
             session.close()
 
+    def get_user_roles_map(self, user_ids: List[int]) -> Dict[int, List[str]]:
+        """複数ユーザーのロール一覧を1クエリで取得 {user_id: [role_name, ...]}"""
+        if not user_ids:
+            return {}
+
+        session = self.db.get_session()
+
+        try:
+            query = text("""
+                SELECT ur.user_id, r.role_name
+                FROM roles r
+                JOIN user_roles ur ON r.id = ur.role_id
+                WHERE ur.user_id IN :user_ids
+            """).bindparams(bindparam('user_ids', expanding=True))
+
+            result = session.execute(query, {'user_ids': [int(uid) for uid in user_ids]}).fetchall()
+
+            roles_map: Dict[int, List[str]] = {}
+            for user_id, role_name in result:
+                roles_map.setdefault(user_id, []).append(role_name)
+            return roles_map
+
+        finally:
+            session.close()
+
     def get_user_pages(self, user_id: int) -> List[Dict[str, Any]]:
         """ユーザーがアクセスできるページ一覧を取得"""
         session = self.db.get_session()
@@ -530,6 +566,50 @@ class AuthService:
         finally:
             session.close()
 
+    def replace_page_permissions(self, role_id: int, perms: List[Tuple[str, bool, bool]]) -> int:
+        """
+        ページ権限を一括で置き換え（1トランザクション）
+
+        Args:
+            role_id: ロールID
+            perms: [(page_name, can_view, can_edit), ...] 対象ページすべて。
+                   閲覧・編集とも無しのページは削除のみ行う
+
+        Returns:
+            int: 登録した権限件数
+        """
+        session = self.db.get_session()
+
+        try:
+            page_names = [page_name for page_name, _, _ in perms]
+            rows = [
+                {'role_id': role_id, 'page_name': page_name,
+                 'can_view': 1 if can_view else 0, 'can_edit': 1 if can_edit else 0}
+                for page_name, can_view, can_edit in perms
+                if can_view or can_edit
+            ]
+
+            if page_names:
+                session.execute(_DELETE_PAGE_PERMISSIONS_IN, {'role_id': role_id, 'page_names': page_names})
+
+            if rows:
+                insert_query = text("""
+                    INSERT INTO page_permissions (role_id, page_name, can_view, can_edit)
+                    VALUES (:role_id, :page_name, :can_view, :can_edit)
+                """)
+                session.execute(insert_query, rows)
+
+            session.commit()
+            logger.info(f"[replace_page_permissions] role_id={role_id}, 登録件数={len(rows)}")
+            return len(rows)
+
+        except Exception as e:
+            session.rollback()
+            logger.error(f"[replace_page_permissions] エラー: {e}")
+            raise e
+        finally:
+            session.close()
+
     # タブ権限管理
     def get_tab_permissions(self, role_id: int, page_name: str = None) -> pd.DataFrame:
         """ロールのタブ権限を取得"""
@@ -635,6 +715,53 @@ class AuthService:
         finally:
             session.close()
 
+    def replace_tab_permissions(self, role_id: int, page_name: str,
+                                perms: List[Tuple[str, bool, bool]]) -> int:
+        """
+        ページ内のタブ権限を一括で置き換え（1トランザクション）
+
+        Args:
+            role_id: ロールID
+            page_name: ページ名
+            perms: [(tab_name, can_view, can_edit), ...] 対象タブすべて。
+                   閲覧・編集とも無しのタブは削除のみ行う
+
+        Returns:
+            int: 登録した権限件数
+        """
+        session = self.db.get_session()
+
+        try:
+            tab_names = [tab_name for tab_name, _, _ in perms]
+            rows = [
+                {'role_id': role_id, 'page_name': page_name, 'tab_name': tab_name,
+                 'can_view': 1 if can_view else 0, 'can_edit': 1 if can_edit else 0}
+                for tab_name, can_view, can_edit in perms
+                if can_view or can_edit
+            ]
+
+            if tab_names:
+                session.execute(_DELETE_TAB_PERMISSIONS_IN,
+                                {'role_id': role_id, 'page_name': page_name, 'tab_names': tab_names})
+
+            if rows:
+                insert_query = text("""
+                    INSERT INTO tab_permissions (role_id, page_name, tab_name, can_view, can_edit)
+                    VALUES (:role_id, :page_name, :tab_name, :can_view, :can_edit)
+                """)
+                session.execute(insert_query, rows)
+
+            session.commit()
+            logger.info(f"[replace_tab_permissions] role_id={role_id}, page_name={page_name}, 登録件数={len(rows)}")
+            return len(rows)
+
+        except Exception as e:
+            session.rollback()
+            logger.error(f"[replace_tab_permissions] エラー: {e}")
+            raise e
+        finally:
+            session.close()
+
     def verify_password(self, user_id: int, password: str) -> bool:
         """パスワードを検証"""
         session = self.db.get_session()
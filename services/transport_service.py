@@ -411,6 +411,10 @@ class TransportService:
         """納入進度を更新"""
         return self.delivery_progress_repo.update_delivery_progress(progress_id, update_data)
     
+    def bulk_update_delivery_progress(self, updates: List[Dict[str, Any]]) -> int:
+        """納入進度の計画数量を一括更新"""
+        return self.delivery_progress_repo.bulk_update_planned_quantity(updates)
+    
     def delete_delivery_progress(self, progress_id: int) -> bool:
         """納入進度を削除"""
         return self.delivery_progress_repo.delete_delivery_progress(progress_id)
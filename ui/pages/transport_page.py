@@ -1,5 +1,6 @@
 # app/ui/pages/transport_page.py
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import date, datetime, timedelta
 from typing import Dict
@@ -14,11 +15,181 @@ from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from reportlab.lib.units import mm
 from reportlab.pdfgen import canvas
+import functools
+import math
 import os
 
+
+# ✅ マスタ取得のキャッシュ（customerは顧客DB切り替え時にキャッシュを分離するためのキー）
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_products(_repo, customer: str) -> pd.DataFrame:
+    """製品一覧を取得（キャッシュ付き）"""
+    return _repo.get_all_products()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_containers(_service, customer: str):
+    """容器一覧を取得（キャッシュ付き）"""
+    return _service.get_containers()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_trucks(_service, customer: str) -> pd.DataFrame:
+    """トラック一覧を取得（キャッシュ付き）"""
+    return _service.get_trucks()
+
+
+@st.cache_data(show_spinner=False)
+def _products_indexed(products_df: pd.DataFrame) -> pd.DataFrame:
+    """製品コードをインデックスにした製品一覧（キャッシュ付き、重複は先頭を採用）"""
+    return products_df.drop_duplicates('product_code').set_index('product_code')
+
+
+@st.cache_data(show_spinner=False)
+def _capacity_map(products_df: pd.DataFrame) -> Dict:
+    """製品コード→入数のマップを作成（キャッシュ付き）"""
+    return products_df.set_index('product_code')['capacity'].to_dict()
+
+
+def _fmt_dates(series: pd.Series, na_rep: str = '') -> pd.Series:
+    """日付列を 'YYYY-MM-DD' 文字列に一括整形（空値はna_rep、解釈できない値は元の文字列のまま）"""
+    # 書式が混在していても要素ごとに解釈する（先頭要素の書式に揃えるとそれ以外がNaTになる）
+    formatted = pd.to_datetime(series, errors='coerce', format='mixed').dt.strftime('%Y-%m-%d')
+    unparsed = formatted.isna() & series.notna()
+    return formatted.where(~unparsed, series.astype(str)).fillna(na_rep)
+
+
+# 日本語フォント候補（Windows / macOS / Linux の順に探索）
+JAPANESE_FONT_PATHS = (
+    'C:/Windows/Fonts/msgothic.ttc',
+    '/System/Library/Fonts/Arial Unicode.ttf',
+    '/usr/share/fonts/truetype/takao-gothic/TakaoPGothic.ttf',
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _ensure_japanese_font() -> bool:
+    """日本語フォントを登録（プロセス内で一度だけ実行）"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.lib.fonts import addMapping
+
+    registered = False
+    for font_path in JAPANESE_FONT_PATHS:
+        try:
+            pdfmetrics.registerFont(TTFont('Japanese', font_path))
+            pdfmetrics.registerFont(TTFont('Japanese-Bold', font_path))
+            registered = True
+            break
+        except Exception:
+            continue
+
+    # フォントマッピングの設定
+    addMapping('Japanese', 0, 0, 'Japanese')
+    addMapping('Japanese', 1, 0, 'Japanese-Bold')
+    return registered
+
+
+@functools.lru_cache(maxsize=1)
+def _japanese_pdf_styles():
+    """日本語対応スタイル（本文・タイトル・見出し）を作成"""
+    styles = getSampleStyleSheet()
+
+    japanese_style = styles['Normal'].clone('JapaneseStyle')
+    japanese_style.fontName = 'Japanese'
+    japanese_style.fontSize = 10
+    japanese_style.leading = 12
+
+    japanese_title_style = styles['Heading1'].clone('JapaneseTitleStyle')
+    japanese_title_style.fontName = 'Japanese-Bold'
+    japanese_title_style.fontSize = 16
+    japanese_title_style.leading = 20
+    japanese_title_style.alignment = 1  # 中央揃え
+
+    japanese_heading_style = styles['Heading2'].clone('JapaneseHeadingStyle')
+    japanese_heading_style.fontName = 'Japanese-Bold'
+    japanese_heading_style.fontSize = 12
+    japanese_heading_style.leading = 16
+
+    return japanese_style, japanese_title_style, japanese_heading_style
+
+
+def _has_edits(edited_df: pd.DataFrame, original_df: pd.DataFrame) -> bool:
+    """数量・体積率列に変更があるか判定（保存処理が扱う列のみ比較）"""
+    if edited_df is original_df:
+        return False
+    if edited_df.shape != original_df.shape:
+        return True
+    return bool(
+        (edited_df['合計数量'].to_numpy() != original_df['合計数量'].to_numpy()).any()
+        or (edited_df['体積率(%)'].to_numpy() != original_df['体積率(%)'].to_numpy()).any()
+    )
+
+
+def _sorted_plan_dates(plan_data: Dict) -> list:
+    """積載日をソートして返す（plan_dataは変更しない）"""
+    return sorted(plan_data.get('daily_plans', {}).keys())
+
+
+def _iter_plan_items(plan_data: Dict):
+    """daily_plansを (積載日, トラックidx, トラック, 品目idx, 品目) に平坦化"""
+    daily_plans = plan_data.get('daily_plans', {})
+    for date_str in _sorted_plan_dates(plan_data):
+        for truck_idx, truck in enumerate(daily_plans[date_str].get('trucks', [])):
+            for item_idx, item in enumerate(truck.get('loaded_items', [])):
+                yield date_str, truck_idx, truck, item_idx, item
+
+
+def _warnings_df(daily_plans: Dict) -> pd.DataFrame:
+    """日別計画の警告を (日付, 警告内容) のDataFrameにまとめる"""
+    return pd.DataFrame.from_records(
+        [(date_str, warning) for date_str, day_plan in daily_plans.items() for warning in day_plan.get('warnings', [])],
+        columns=['日付', '警告内容']
+    )
+
+
+# _flatten_plan の列（truck_idx / item_idx は daily_plans 内の位置）
+PLAN_FLAT_COLUMNS = [
+    '積載日', 'truck_idx', 'item_idx', 'トラック', '製品コード', '製品名',
+    '容器数', '合計数量', '納期', '体積率(%)', '前倒し'
+]
+
+
+def _flatten_plan(plan_data: Dict) -> pd.DataFrame:
+    """計画データを1品目1行のDataFrameに平坦化（積載日順）"""
+    flat_df = pd.DataFrame.from_records(
+        [
+            (
+                date_str,
+                truck_idx,
+                item_idx,
+                truck.get('truck_name', '不明'),
+                item.get('product_code', ''),
+                item.get('product_name', ''),
+                item.get('num_containers', 0),
+                item.get('total_quantity', 0),
+                item.get('delivery_date'),
+                truck.get('utilization', {}).get('volume_rate', 0),
+                bool(item.get('is_advanced', False))
+            )
+            for date_str, truck_idx, truck, item_idx, item in _iter_plan_items(plan_data)
+        ],
+        columns=PLAN_FLAT_COLUMNS
+    )
+    # 納期は元の値のまま保持（出力先ごとに _fmt_dates / to_datetime で整形）
+    return flat_df
+
+
 class TransportPage:
     """配送便計画ページ - トラック積載計画の作成画面"""
 
+    PLAN_EDITOR_COLUMNS = ['積載日', 'トラック', '製品コード', '製品名', '容器数', '合計数量', '納期', '体積率(%)']
+    # これを超える行数の計画は日付で絞り込んでエディタに表示
+    PLAN_EDITOR_MAX_ROWS = 500
+    # 保存済み計画のセッションキャッシュ有効期間（秒）。他セッションでの更新はこの間隔で反映
+    SAVED_PLAN_CACHE_TTL = 300
+    PLAN_EXCEL_COLUMNS = ['積載日', 'トラック名', '製品コード', '製品名', '容器数', '合計数量', '納期', '体積積載率(%)', '前倒し配送']
+
     def __init__(self, transport_service, auth_service=None):
         self.service = transport_service
         self.auth_service = auth_service
@@ -43,6 +214,13 @@ class TransportPage:
         # タブ権限がない場合はページ権限を使用
         return self.auth_service.can_edit_tab(user['id'], "配送便計画", tab_name) or self._can_edit_page()
 
+    def _cache_key(self) -> str:
+        """キャッシュキー用の顧客名を取得"""
+        db = getattr(self.service, 'db', None)
+        if db is not None and hasattr(db, 'get_current_customer'):
+            return db.get_current_customer()
+        return 'default'
+
     def show(self):
         """ページ表示"""
         st.title("🚚 配送便計画")
@@ -621,8 +799,29 @@ class TransportPage:
                 selected_plan_id = plan_options[selected_plan_key]
                 
                 # ✅ 修正: 選択した計画IDを使って詳細データを取得
-                with st.spinner("計画データを読み込み中..."):
-                    selected_plan = self.service.get_loading_plan(selected_plan_id)
+                # 同じ計画の再表示（セル編集などのrerun）ではセッションのキャッシュを使用
+                # 計画IDは顧客DBごとの採番のため、顧客名と組み合わせてキーにする
+                plan_cache_key = (self._cache_key(), selected_plan_id)
+                cached_plan = st.session_state.get('_saved_plan_cache')
+                if st.button("🔄 計画を再読み込み", key="reload_saved_plan"):
+                    cached_plan = None
+                if (
+                    cached_plan
+                    and cached_plan['key'] == plan_cache_key
+                    and datetime.now() - cached_plan['loaded_at'] < timedelta(seconds=self.SAVED_PLAN_CACHE_TTL)
+                ):
+                    selected_plan = cached_plan['plan']
+                else:
+                    with st.spinner("計画データを読み込み中..."):
+                        selected_plan = self.service.get_loading_plan(selected_plan_id)
+                    if selected_plan:
+                        st.session_state['_saved_plan_cache'] = {
+                            'key': plan_cache_key,
+                            'plan': selected_plan,
+                            'loaded_at': datetime.now()
+                        }
+                    else:
+                        st.session_state.pop('_saved_plan_cache', None)
                 
                 if selected_plan:
                     self._display_saved_plan(selected_plan)
@@ -728,6 +927,7 @@ class TransportPage:
             with col_delete2:
                 if st.button("🗑️ 削除", type="secondary", use_container_width=True, disabled=not can_edit, key=f"delete_{plan_data.get('id')}"):
                     if self._confirm_and_delete_plan(plan_data.get('id'), plan_data.get('plan_name', '無題')):
+                        st.session_state.pop('_saved_plan_cache', None)
                         st.success("✅ 計画を削除しました")
                         st.rerun()
             
@@ -740,7 +940,14 @@ class TransportPage:
             if not daily_plans:
                 st.warning("❌ daily_plans データがありません")
                 st.info("計画データの構造を確認しています...")
-                st.json(plan_data)  # 全データを表示して確認
+                # 大きなリスト/辞書は件数のみ表示（全データはチェック時のみ送信）
+                st.json({
+                    key: (value if not isinstance(value, (list, dict)) or len(value) < 20
+                          else f"<{len(value)} items truncated>")
+                    for key, value in plan_data.items()
+                })
+                if st.checkbox("生データ全体を表示", key=f"show_raw_plan_{plan_data.get('id')}"):
+                    st.json(plan_data, expanded=False)
                 return
             
             # サマリー表示
@@ -774,236 +981,214 @@ class TransportPage:
                     key=f"version_name_{plan_data['id']}"
                 )
             
-            # 全データを1つのDataFrameに変換
-            all_plan_data = []
-            # ✅ row_id_mapを定義
-            row_id_map = {}  # {row_index: (date_str, truck_idx, item_idx)}
-            
-            for date_str in sorted(daily_plans.keys()):
-                day_plan = daily_plans[date_str]
-                
-                for truck_idx, truck in enumerate(day_plan.get('trucks', [])):
-                    truck_name = truck.get('truck_name', '不明')
-                    utilization = truck.get('utilization', {})
-                    
-                    for item_idx, item in enumerate(truck.get('loaded_items', [])):
-                        # 納期のフォーマット処理
-                        delivery_date = item.get('delivery_date')
-                        delivery_date_str = ''
-                        if delivery_date:
-                            if hasattr(delivery_date, 'strftime'):
-                                delivery_date_str = delivery_date.strftime('%Y-%m-%d')
-                            elif hasattr(delivery_date, 'date'):
-                                delivery_date_str = delivery_date.date().strftime('%Y-%m-%d')
-                            else:
-                                delivery_date_str = str(delivery_date)
-                        
-                        # ✅ row_id_mapにインデックスを追加
-                        row_index = len(all_plan_data)
-                        row_id_map[row_index] = (date_str, truck_idx, item_idx)
-                        
-                        all_plan_data.append({
-                            '積載日': date_str,
-                            'トラック': truck_name,
-                            '製品コード': item.get('product_code', ''),
-                            '製品名': item.get('product_name', ''),
-                            '容器数': item.get('num_containers', 0),
-                            '合計数量': item.get('total_quantity', 0),
-                            '納期': delivery_date_str,
-                            '体積率(%)': utilization.get('volume_rate', 0)
-                        })
+            # 全データを1つのDataFrameに変換（同じ計画の再表示ではキャッシュを使用）
+            plan_df, row_id_map = self._get_plan_frame(plan_data)
             
-            if all_plan_data:
-                plan_df = pd.DataFrame(all_plan_data)
-                
+            if not plan_df.empty:
                 st.success(f"✅ 計画データを読み込みました: {len(plan_df)} 行")
                 
                 # 編集可能なデータエディタ
                 st.info("💡 **編集方法:** セルをダブルクリックして値を変更し、「💾 変更を保存」をクリック")
                 
-# 編集可能なデータエディタ部分を修正
-            edited_df = st.data_editor(
-                plan_df,
-                use_container_width=True,
-                hide_index=True,
-                disabled=['積載日', 'トラック', '容器数', '体積率(%)'],  # 容器数と積載率を編集不可に
-                column_config={
-                    "積載日": st.column_config.TextColumn("積載日"),
-                    "トラック": st.column_config.TextColumn("トラック"),
-                    "製品コード": st.column_config.TextColumn("製品コード"),
-                    "製品名": st.column_config.TextColumn("製品名"),
-                    "容器数": st.column_config.NumberColumn("容器数", min_value=0, step=1, disabled=True),
-                    "合計数量": st.column_config.NumberColumn("合計数量", min_value=0, step=1),
-                    "納期": st.column_config.TextColumn("納期"),
-                    "体積率(%)": st.column_config.NumberColumn("体積率(%)", format="%d%%", disabled=True)
-                },
-                key=f"plan_editor_{plan_data.get('id', 'current')}"
-            )
-
-            # 合計数量が変更された場合、容器数と積載率を自動計算
-            if not edited_df.equals(plan_df):
-                # 必要な情報を取得
-                try:
-                    products_df = self.service.product_repo.get_all_products()
-                    capacity_map = dict(zip(products_df['product_code'], products_df['capacity']))
-                    containers = self.service.get_containers()
-                    container_map = {container.id: container for container in containers}
-                    trucks_df = self.service.get_trucks()
-                    truck_map = {truck['id']: truck for _, truck in trucks_df.iterrows()}
-                except Exception as e:
-                    st.warning(f"情報取得エラー: {e}")
-                    capacity_map = {}
-                    container_map = {}
-                    truck_map = {}
+                editor_key = f"plan_editor_{plan_data.get('id', 'current')}"
+
+                # ✅ 大きな計画は日付で絞り込んでエディタに渡す（行番号はplan_dfのインデックスで保持）
+                if len(plan_df) > self.PLAN_EDITOR_MAX_ROWS:
+                    # 表示行が変わるとエディタの編集内容が破棄されるため、未保存の変更がある間は絞り込みを固定
+                    has_pending_edits = bool(st.session_state.get(editor_key, {}).get('edited_rows'))
+                    sorted_dates = _sorted_plan_dates(plan_data)
+                    date_filter = st.multiselect(
+                        "表示する日付",
+                        options=sorted_dates,
+                        default=sorted_dates[:7],
+                        disabled=has_pending_edits,
+                        key=f"plan_date_filter_{plan_data.get('id', 'current')}"
+                    )
+                    if has_pending_edits:
+                        st.caption("⚠️ 未保存の変更があります。日付の絞り込みを変更するには先に「💾 変更を保存」するか、編集を破棄してください")
+                        if st.button("↩️ 編集を破棄", key=f"discard_{editor_key}"):
+                            st.session_state.pop(editor_key, None)
+                            st.rerun()
+                    view_df = plan_df[plan_df['積載日'].isin(date_filter)]
+                else:
+                    view_df = plan_df
                 
-                # 変更があった行を処理
-                for idx in range(len(plan_df)):
-                    original_row = plan_df.iloc[idx]
-                    edited_row = edited_df.iloc[idx]
+                edited_df = st.data_editor(
+                    view_df,
+                    use_container_width=True,
+                    hide_index=True,
+                    num_rows="fixed",
+                    # 保存対象は合計数量のみ（それ以外の列は編集不可）
+                    disabled=['積載日', 'トラック', '製品コード', '製品名', '容器数', '納期', '体積率(%)'],
+                    column_config={
+                        "積載日": st.column_config.TextColumn("積載日"),
+                        "トラック": st.column_config.TextColumn("トラック"),
+                        "製品コード": st.column_config.TextColumn("製品コード"),
+                        "製品名": st.column_config.TextColumn("製品名"),
+                        "容器数": st.column_config.NumberColumn("容器数", min_value=0, step=1, disabled=True),
+                        "合計数量": st.column_config.NumberColumn("合計数量", min_value=0, step=1),
+                        "納期": st.column_config.DateColumn("納期", format="YYYY-MM-DD"),
+                        "体積率(%)": st.column_config.NumberColumn("体積率(%)", format="%d%%", disabled=True)
+                    },
+                    key=editor_key
+                )
+
+                # 合計数量が変更された場合、容器数と積載率を自動計算
+                if _has_edits(edited_df, view_df):
+                    # 必要な情報を取得
+                    try:
+                        cache_key = self._cache_key()
+                        products_df = _load_products(self.service.product_repo, cache_key)
+                        capacity_map = _capacity_map(products_df)
+                        containers = _load_containers(self.service, cache_key)
+                        trucks_df = _load_trucks(self.service, cache_key)
                     
-                    # 変更があったフィールドを検出
-                    changes = {}
-                    old_values = {}
+                        # ✅ ルックアップ表をSeriesで用意（行ごとの辞書参照を.mapに置き換え）
+                        product_container = _products_indexed(products_df)['used_container_id']
+                        container_dims = pd.DataFrame.from_records(
+                            [(c.id, (c.width * c.depth * c.height) / 1000000000, c.max_weight) for c in containers],
+                            columns=['id', 'volume', 'max_weight']
+                        ).set_index('id')
+                        truck_volumes = pd.Series(
+                            (trucks_df['width'] * trucks_df['depth'] * trucks_df['height'] / 1000000000).to_numpy(),
+                            index=trucks_df['id']
+                        )
+                    except Exception as e:
+                        st.warning(f"情報取得エラー: {e}")
+                        capacity_map = {}
+                        product_container = pd.Series(dtype=object)
+                        container_dims = pd.DataFrame(columns=['volume', 'max_weight'])
+                        truck_volumes = pd.Series(dtype=float)
+                
+                    # 製品コードから入数・容器体積・容器重量を一括で引く
+                    row_capacity = edited_df['製品コード'].map(capacity_map).fillna(1)
+                    row_container_id = edited_df['製品コード'].map(product_container)
+                    row_container_volume = row_container_id.map(container_dims['volume']).fillna(0)
+                    row_container_weight = row_container_id.map(container_dims['max_weight']).fillna(0)
+                
+                    # 積載率の計算ログ（トラックごとに最新値のみ保持し、最後にまとめて表示）
+                    calc_log = {}
+                
+                    # 変更があった行（数量または積載率）を先に確定
+                    changed_mask = (
+                        (edited_df['合計数量'].to_numpy() != view_df['合計数量'].to_numpy())
+                        | (edited_df['体積率(%)'].to_numpy() != view_df['体積率(%)'].to_numpy())
+                    )
+                    changed_rows = np.flatnonzero(changed_mask)
+                    row_labels = edited_df.index.to_numpy()  # plan_df上の行番号（row_id_mapのキー）
+                
+                    # 容器数計算（入数0以下は1容器扱い）をまとめて反映
+                    if changed_rows.size:
+                        quantities = edited_df['合計数量'].to_numpy()[changed_rows]
+                        capacities = row_capacity.to_numpy()[changed_rows]
+                        safe_capacities = np.where(capacities > 0, capacities, 1)
+                        edited_df.loc[changed_mask, '容器数'] = np.where(
+                            capacities > 0,
+                            np.maximum(1, (quantities + safe_capacities - 1) // safe_capacities),
+                            1
+                        )
+                
+                    # ✅ 変更行を含むトラック（積載日, トラックidx）のみ積載率を再計算
+                    dirty_trucks = {
+                        row_id_map[row_labels[pos]][:2] for pos in changed_rows if row_labels[pos] in row_id_map
+                    }
+                    try:
+                        truck_utilization = {}
                     
-                    # 数量または積載率が変更された場合
-                    if (original_row['合計数量'] != edited_row['合計数量'] or
-                        original_row['体積率(%)'] != edited_row['体積率(%)']):
+                        for pos, row_label, num_containers, container_volume, container_weight in zip(
+                            range(len(edited_df)),
+                            row_labels,
+                            edited_df['容器数'].to_numpy(),
+                            row_container_volume.to_numpy(),
+                            row_container_weight.to_numpy()
+                        ):
+                            if row_label not in row_id_map:
+                                continue
+                            date_str, truck_idx, item_idx = row_id_map[row_label]
+                            truck_key = (date_str, truck_idx)
+                            if truck_key not in dirty_trucks:
+                                continue
                         
-                        changes['total_quantity'] = edited_row['合計数量']
-                        changes['num_containers'] = edited_row['容器数']
-                        changes['volume_utilization'] = edited_row['体積率(%)']
+                            if truck_key not in truck_utilization:
+                                truck_utilization[truck_key] = {
+                                    'total_volume': 0,
+                                    'total_weight': 0,
+                                    'truck_id': plan_data['daily_plans'][date_str]['trucks'][truck_idx]['truck_id'],
+                                    'rows': []
+                                }
                         
-                        old_values['total_quantity'] = original_row['合計数量']
-                        old_values['num_containers'] = original_row['容器数']
-                        old_values['volume_utilization'] = original_row['体積率(%)']
+                            # 合計体積・重量に加算（容器未登録の製品は0）
+                            truck_utilization[truck_key]['total_volume'] += container_volume * num_containers
+                            truck_utilization[truck_key]['total_weight'] += container_weight * num_containers
+                            truck_utilization[truck_key]['rows'].append(pos)
                     
-                    if changes:
-                        # 容器数計算
-                        product_code = edited_row['製品コード']
-                        capacity = capacity_map.get(product_code, 1)
+                        # 積載率を計算して該当トラックの行だけに反映（最後に1回で書き込み）
+                        new_rates = edited_df['体積率(%)'].to_numpy(dtype=float).copy()
+                        assign_mask = np.zeros(len(edited_df), dtype=bool)
+                        for truck_key, util_data in truck_utilization.items():
+                            truck_id = util_data['truck_id']
+                            if truck_id not in truck_volumes.index:
+                                continue
+                            truck_volume = truck_volumes[truck_id]
+                            volume_rate = min(100, (util_data['total_volume'] / truck_volume) * 100) if truck_volume > 0 else 0
                         
-                        if capacity > 0:
-                            new_num_containers = (edited_row['合計数量'] + capacity - 1) // capacity
-                            edited_df.at[idx, '容器数'] = max(1, new_num_containers)
-                        else:
-                            edited_df.at[idx, '容器数'] = 1
+                            new_rates[util_data['rows']] = round(volume_rate, 1)
+                            assign_mask[util_data['rows']] = True
                         
-                        # トラックごとの積載率を再計算
-                        try:
-                            # トラックごとにグループ化して計算
-                            truck_utilization = {}
-                            
-                            for idx, row in edited_df.iterrows():
-                                if idx in row_id_map:
-                                    date_str, truck_idx, item_idx = row_id_map[idx]
-                                    truck_id = plan_data['daily_plans'][date_str]['trucks'][truck_idx]['truck_id']
-                                    
-                                    # ✅ キーを日付とトラックインデックスも含めて一意にする
-                                    truck_key = f"{date_str}_{truck_id}_{truck_idx}"
-                                    
-                                    if truck_key not in truck_utilization:
-                                        truck_utilization[truck_key] = {
-                                            'total_volume': 0,
-                                            'total_weight': 0,
-                                            'date_str': date_str,
-                                            'truck_idx': truck_idx,
-                                            'truck_id': truck_id
-                                        }
-                                    
-                                    # 製品の容器情報を取得
-                                    product_code = row['製品コード']
-                                    product_info = products_df[products_df['product_code'] == product_code]
-                                    if not product_info.empty:
-                                        container_id = product_info.iloc[0]['used_container_id']
-                                        if container_id and container_id in container_map:
-                                            container = container_map[container_id]
-                                            # 容器の体積と重量を計算
-                                            container_volume = (container.width * container.depth * container.height) / 1000000000  # m³換算
-                                            container_weight = container.max_weight
-                                            
-                                            # 合計体積・重量に加算
-                                            num_containers = row['容器数']
-                                            truck_utilization[truck_key]['total_volume'] += container_volume * num_containers
-                                            truck_utilization[truck_key]['total_weight'] += container_weight * num_containers
-
-                            # 積載率を計算して反映
-                            for truck_key, util_data in truck_utilization.items():
-                                truck_id = util_data['truck_id']
-                                if truck_id in truck_map:
-                                    truck = truck_map[truck_id]
-                                    # トラックの最大容量を計算
-                                    truck_volume = (truck['width'] * truck['depth'] * truck['height']) / 1000000000
-                                    truck_max_weight = truck['max_weight']
-                                    
-                                    # 積載率計算
-                                    volume_rate = min(100, (util_data['total_volume'] / truck_volume) * 100) if truck_volume > 0 else 0
-                                    
-                                    # ✅ 該当トラックの行だけに積載率を反映
-                                    for df_idx in range(len(edited_df)):
-                                        if df_idx in row_id_map:
-                                            date_str, truck_idx, item_idx = row_id_map[df_idx]
-                                            current_truck_id = plan_data['daily_plans'][date_str]['trucks'][truck_idx]['truck_id']
-                                            # 同じトラックかつ同じ日付の場合
-                                            if (current_truck_id == truck_id and 
-                                                date_str == util_data['date_str'] and 
-                                                truck_idx == util_data['truck_idx']):
-                                                edited_df.at[df_idx, '体積率(%)'] = round(volume_rate, 1)
-                            
-                            # デバッグ情報（必要に応じて）
-                            st.write(f"🚛 トラック {truck_id}: 体積率 {volume_rate:.1f}%")
-                        
-                        except Exception as e:
-                            st.error(f"積載率計算エラー: {e}")
+                            calc_log[truck_key] = f"🚛 {truck_key[0]} トラック {truck_id}: 体積率 {volume_rate:.1f}%"
+                    
+                        if assign_mask.any():
+                            edited_df['体積率(%)'] = new_rates
+                
+                    except Exception as e:
+                        st.error(f"積載率計算エラー: {e}")
                 
-                # 保存ボタン
-                st.markdown("---")
-                if st.button("💾 変更を保存", type="primary", key=f"save_{plan_data.get('id', 'current')}"):
-                    # 保存方式に応じた処理
-                    if save_mode == "🔀 バージョン保存":
-                        # バージョン作成（実装済みの場合）
+                    if calc_log:
+                        with st.expander("計算ログ", expanded=False):
+                            st.markdown("  \n".join(calc_log.values()))
+                
+                    # 保存ボタン
+                    st.markdown("---")
+                    if st.button("💾 変更を保存", type="primary", key=f"save_{plan_data.get('id', 'current')}"):
+                        # 保存方式に応じた処理
+                        if save_mode == "🔀 バージョン保存":
+                            # バージョン作成（実装済みの場合）
+                            try:
+                                version_id = self.service.create_plan_version(
+                                    plan_data['id'], 
+                                    version_name,
+                                    "user123"  # 実際はセッションからユーザーIDを取得
+                                )
+                                if version_id:
+                                    st.success(f"✅ バージョン '{version_name}' を作成しました")
+                            except Exception as e:
+                                st.info(f"バージョン機能は現在開発中です: {e}")
+                    
+                        # 通常の保存処理
                         try:
-                            version_id = self.service.create_plan_version(
-                                plan_data['id'], 
-                                version_name,
-                                "user123"  # 実際はセッションからユーザーIDを取得
+                            success = self._save_plan_changes(
+                                plan_data=plan_data,
+                                original_df=view_df,
+                                edited_df=edited_df,
+                                row_id_map=row_id_map
                             )
-                            if version_id:
-                                st.success(f"✅ バージョン '{version_name}' を作成しました")
-                        except Exception as e:
-                            st.info(f"バージョン機能は現在開発中です: {e}")
-                    
-                    # 通常の保存処理
-                    try:
-                        success = self._save_plan_changes(
-                            plan_data=plan_data,
-                            original_df=plan_df,
-                            edited_df=edited_df,
-                            row_id_map=row_id_map
-                        )
                         
-                        if success:
-                            st.success("✅ 変更を保存しました")
-                            st.rerun()
-                        else:
-                            st.info("変更はありませんでした")
-                    except Exception as e:
-                        st.info(f"保存機能は現在開発中です: {e}")
+                            if success:
+                                # 再実行はせず、次回のrerunで保存後の計画を再取得させる
+                                st.session_state.pop('_saved_plan_cache', None)
+                                st.success("✅ 変更を保存しました")
+                            else:
+                                st.info("変更はありませんでした")
+                        except Exception as e:
+                            st.info(f"保存機能は現在開発中です: {e}")
                         
             else:
                 st.warning("表示する積載計画データがありません")
                 
             # 警告表示
-            warnings_data = []
-            for date_str, day_plan in daily_plans.items():
-                for warning in day_plan.get('warnings', []):
-                    warnings_data.append({
-                        '日付': date_str,
-                        '警告内容': warning
-                    })
-            
-            if warnings_data:
+            warnings_df = _warnings_df(daily_plans)
+            if not warnings_df.empty:
                 st.subheader("⚠️ 警告一覧")
-                warnings_df = pd.DataFrame(warnings_data)
                 st.dataframe(warnings_df, use_container_width=True, hide_index=True)
                     
         except Exception as e:
@@ -1011,6 +1196,27 @@ class TransportPage:
             import traceback
             st.code(traceback.format_exc())
 
+    def _get_plan_frame(self, plan_data: Dict):
+        """編集用DataFrameとrow_id_mapを取得（計画データが同じ間はセッションに保持）"""
+        cache = st.session_state.get('_plan_df_cache')
+        if cache is not None and cache['plan'] is plan_data:
+            return cache['plan_df'], cache['row_id_map']
+        
+        flat_df = _flatten_plan(plan_data)
+        # ✅ row_id_map: {row_index: (date_str, truck_idx, item_idx)}
+        row_id_map = dict(enumerate(zip(
+            flat_df['積載日'].tolist(),
+            flat_df['truck_idx'].tolist(),
+            flat_df['item_idx'].tolist()
+        )))
+        plan_df = flat_df[self.PLAN_EDITOR_COLUMNS].copy()
+        # エディタのDateColumn用にdatetime64へ変換（書式が混在していても要素ごとに解釈）
+        plan_df['納期'] = pd.to_datetime(plan_df['納期'], errors='coerce', format='mixed')
+        
+        # 直近の1計画分のみ保持
+        st.session_state['_plan_df_cache'] = {'plan': plan_data, 'plan_df': plan_df, 'row_id_map': row_id_map}
+        return plan_df, row_id_map
+
     def _export_plan_to_pdf(self, plan_data: Dict):
         """積載計画をPDFとしてエクスポート（日本語対応）"""
         try:
@@ -1018,53 +1224,13 @@ class TransportPage:
             buffer = io.BytesIO()
             
             # 横向きA4でドキュメント作成
-            doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
+            doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), pageCompression=1)
             elements = []
-            styles = getSampleStyleSheet()
             
-            # ✅ 日本語フォントの設定
-            from reportlab.pdfbase import pdfmetrics
-            from reportlab.pdfbase.ttfonts import TTFont
-            from reportlab.lib.fonts import addMapping
-            
-            # 日本語フォントの登録（システムにインストールされているフォントを使用）
-            try:
-                # Windowsの日本語フォント
-                pdfmetrics.registerFont(TTFont('Japanese', 'C:/Windows/Fonts/msgothic.ttc'))
-                pdfmetrics.registerFont(TTFont('Japanese-Bold', 'C:/Windows/Fonts/msgothic.ttc'))
-            except:
-                try:
-                    # macOSの日本語フォント
-                    pdfmetrics.registerFont(TTFont('Japanese', '/System/Library/Fonts/Arial Unicode.ttf'))
-                    pdfmetrics.registerFont(TTFont('Japanese-Bold', '/System/Library/Fonts/Arial Unicode.ttf'))
-                except:
-                    try:
-                        # Linuxの日本語フォント
-                        pdfmetrics.registerFont(TTFont('Japanese', '/usr/share/fonts/truetype/takao-gothic/TakaoPGothic.ttf'))
-                        pdfmetrics.registerFont(TTFont('Japanese-Bold', '/usr/share/fonts/truetype/takao-gothic/TakaoPGothic.ttf'))
-                    except:
-                        st.warning("日本語フォントが見つかりません。デフォルトフォントを使用します。")
-            
-            # フォントマッピングの設定
-            addMapping('Japanese', 0, 0, 'Japanese')
-            addMapping('Japanese', 1, 0, 'Japanese-Bold')
-            
-            # ✅ 日本語対応スタイルの作成
-            japanese_style = styles['Normal'].clone('JapaneseStyle')
-            japanese_style.fontName = 'Japanese'
-            japanese_style.fontSize = 10
-            japanese_style.leading = 12
-            
-            japanese_title_style = styles['Heading1'].clone('JapaneseTitleStyle')
-            japanese_title_style.fontName = 'Japanese-Bold'
-            japanese_title_style.fontSize = 16
-            japanese_title_style.leading = 20
-            japanese_title_style.alignment = 1  # 中央揃え
-            
-            japanese_heading_style = styles['Heading2'].clone('JapaneseHeadingStyle')
-            japanese_heading_style.fontName = 'Japanese-Bold'
-            japanese_heading_style.fontSize = 12
-            japanese_heading_style.leading = 16
+            # ✅ 日本語フォント・スタイル（初回のみ登録、以降はキャッシュを利用）
+            if not _ensure_japanese_font():
+                st.warning("日本語フォントが見つかりません。デフォルトフォントを使用します。")
+            japanese_style, japanese_title_style, japanese_heading_style = _japanese_pdf_styles()
             
             # タイトル
             title = Paragraph(f"積載計画: {plan_data.get('plan_name', '無題')}", japanese_title_style)
@@ -1102,38 +1268,10 @@ class TransportPage:
             
             if daily_plans:
                 # 全データを収集
-                all_plan_data = []
                 header = ['積載日', 'トラック', '製品コード', '製品名', '容器数', '合計数量', '納期']
-                all_plan_data.append(header)
-                
-                for date_str in sorted(daily_plans.keys()):
-                    day_plan = daily_plans[date_str]
-                    
-                    for truck in day_plan.get('trucks', []):
-                        truck_name = truck.get('truck_name', '不明')
-                        
-                        for item in truck.get('loaded_items', []):
-                            # 納期のフォーマット処理
-                            delivery_date = item.get('delivery_date')
-                            delivery_date_str = ''
-                            if delivery_date:
-                                if hasattr(delivery_date, 'strftime'):
-                                    delivery_date_str = delivery_date.strftime('%Y-%m-%d')
-                                elif hasattr(delivery_date, 'date'):
-                                    delivery_date_str = delivery_date.date().strftime('%Y-%m-%d')
-                                else:
-                                    delivery_date_str = str(delivery_date)
-                            
-                            row = [
-                                date_str,
-                                truck_name,
-                                item.get('product_code', ''),
-                                item.get('product_name', ''),
-                                str(item.get('num_containers', 0)),
-                                str(item.get('total_quantity', 0)),
-                                delivery_date_str
-                            ]
-                            all_plan_data.append(row)
+                pdf_df = _flatten_plan(plan_data)[header]
+                pdf_df['納期'] = _fmt_dates(pdf_df['納期'])
+                all_plan_data = [header] + pdf_df.astype(str).values.tolist()
                 
                 # テーブル作成
                 if len(all_plan_data) > 1:  # ヘッダー以外にデータがある場合
@@ -1160,16 +1298,11 @@ class TransportPage:
                 elements.append(Paragraph("積載計画データがありません", japanese_style))
             
             # 警告情報
-            warnings_data = []
-            for date_str, day_plan in daily_plans.items():
-                for warning in day_plan.get('warnings', []):
-                    warnings_data.append([date_str, warning])
-            
-            if warnings_data:
+            warnings_df = _warnings_df(daily_plans)
+            if not warnings_df.empty:
                 elements.append(Spacer(1, 12))
                 elements.append(Paragraph("警告一覧", japanese_heading_style))
-                warnings_header = ['日付', '警告内容']
-                warnings_table_data = [warnings_header] + warnings_data
+                warnings_table_data = [list(warnings_df.columns)] + warnings_df.values.tolist()
                 
                 warnings_table = Table(warnings_table_data, colWidths=[30*mm, 150*mm])
                 warnings_table.setStyle(TableStyle([
@@ -1221,98 +1354,47 @@ class TransportPage:
                 daily_plans = plan_data.get('daily_plans', {})
                 
                 if daily_plans:
-                    plan_data_list = []
-                    prev_date = None
+                    flat_df = _flatten_plan(plan_data)
                     
-                    for date_str in sorted(daily_plans.keys()):
-                        day_plan = daily_plans[date_str]
-                        
-                        # 日付が変わったら空白行を挿入
-                        if prev_date is not None and prev_date != date_str:
-                            plan_data_list.append({
-                                '積載日': '',
-                                'トラック名': '',
-                                '製品コード': '',
-                                '製品名': '',
-                                '容器数': '',
-                                '合計数量': '',
-                                '納期': '',
-                                '体積積載率(%)': '',
-                                '前倒し配送': ''
-                            })
-                        
-                        prev_date = date_str
+                    if not flat_df.empty:
+                        flat_df['納期'] = _fmt_dates(flat_df['納期'])
+                        flat_df['前倒し配送'] = flat_df['前倒し'].map({True: '○', False: '×'})
+                        plan_df = flat_df.rename(
+                            columns={'トラック': 'トラック名', '体積率(%)': '体積積載率(%)'}
+                        )[self.PLAN_EXCEL_COLUMNS]
                         
-                        for truck in day_plan.get('trucks', []):
-                            truck_name = truck.get('truck_name', '不明')
-                            utilization = truck.get('utilization', {})
-                            
-                            for item in truck.get('loaded_items', []):
-                                # 納期のフォーマット処理
-                                delivery_date = item.get('delivery_date')
-                                delivery_date_str = ''
-                                if delivery_date:
-                                    if hasattr(delivery_date, 'strftime'):
-                                        delivery_date_str = delivery_date.strftime('%Y-%m-%d')
-                                    elif hasattr(delivery_date, 'date'):
-                                        delivery_date_str = delivery_date.date().strftime('%Y-%m-%d')
-                                    else:
-                                        delivery_date_str = str(delivery_date)
-                                
-                                plan_data_list.append({
-                                    '積載日': date_str,
-                                    'トラック名': truck_name,
-                                    '製品コード': item.get('product_code', ''),
-                                    '製品名': item.get('product_name', ''),
-                                    '容器数': item.get('num_containers', 0),
-                                    '合計数量': item.get('total_quantity', 0),
-                                    '納期': delivery_date_str,
-                                    '体積積載率(%)': utilization.get('volume_rate', 0),
-                                    '前倒し配送': '○' if item.get('is_advanced', False) else '×'
-                                })
-                    
-                    if plan_data_list:
-                        plan_df = pd.DataFrame(plan_data_list)
+                        # 日付が変わる位置に空白行を挿入
+                        blank_row = pd.DataFrame([[''] * len(self.PLAN_EXCEL_COLUMNS)], columns=self.PLAN_EXCEL_COLUMNS)
+                        day_groups = [group for _, group in plan_df.groupby('積載日', sort=True)]
+                        plan_df = pd.concat(
+                            [part for group in day_groups for part in (blank_row, group)][1:],
+                            ignore_index=True
+                        )
                         plan_df.to_excel(writer, sheet_name='積載計画詳細', index=False)
                 
                 # 警告シート
-                warnings_data = []
-                for date_str, day_plan in daily_plans.items():
-                    for warning in day_plan.get('warnings', []):
-                        warnings_data.append({
-                            '日付': date_str,
-                            '警告内容': warning
-                        })
-                
-                if warnings_data:
-                    warnings_df = pd.DataFrame(warnings_data)
+                warnings_df = _warnings_df(daily_plans)
+                if not warnings_df.empty:
                     warnings_df.to_excel(writer, sheet_name='警告一覧', index=False)
                 
                 # 積載不可アイテムシート
                 unloaded_tasks = plan_data.get('unloaded_tasks', [])
                 if unloaded_tasks:
-                    unloaded_data = []
-                    for task in unloaded_tasks:
-                        delivery_date = task.get('delivery_date')
-                        delivery_date_str = ''
-                        if delivery_date:
-                            if hasattr(delivery_date, 'strftime'):
-                                delivery_date_str = delivery_date.strftime('%Y-%m-%d')
-                            elif hasattr(delivery_date, 'date'):
-                                delivery_date_str = delivery_date.date().strftime('%Y-%m-%d')
-                            else:
-                                delivery_date_str = str(delivery_date)
-                        
-                        unloaded_data.append({
-                            '製品コード': task.get('product_code', ''),
-                            '製品名': task.get('product_name', ''),
-                            '容器数': task.get('num_containers', 0),
-                            '合計数量': task.get('total_quantity', 0),
-                            '納期': delivery_date_str,
-                            '理由': task.get('reason', '積載容量不足')
-                        })
-                    
-                    unloaded_df = pd.DataFrame(unloaded_data)
+                    unloaded_df = pd.DataFrame.from_records(
+                        [
+                            (
+                                task.get('product_code', ''),
+                                task.get('product_name', ''),
+                                task.get('num_containers', 0),
+                                task.get('total_quantity', 0),
+                                task.get('delivery_date'),
+                                task.get('reason', '積載容量不足')
+                            )
+                            for task in unloaded_tasks
+                        ],
+                        columns=['製品コード', '製品名', '容器数', '合計数量', '納期', '理由']
+                    )
+                    unloaded_df['納期'] = _fmt_dates(unloaded_df['納期'])
                     unloaded_df.to_excel(writer, sheet_name='積載不可アイテム', index=False)
             
             output.seek(0)
@@ -1329,14 +1411,15 @@ class TransportPage:
     def _show_daily_view(self, daily_plans):
         """日別表示"""
         
-        for date_str in sorted(daily_plans.keys()):
+        for date_idx, date_str in enumerate(sorted(daily_plans.keys())):
             plan = daily_plans[date_str]
             
             trucks = plan.get('trucks', [])
             warnings = plan.get('warnings', [])
             total_trips = len(trucks)
             
-            with st.expander(f"📅 {date_str} ({total_trips}便)", expanded=True):
+            # ✅ 先頭日のみ展開。2日目以降の明細はチェック時だけ作成・描画
+            with st.expander(f"📅 {date_str} ({total_trips}便)", expanded=(date_idx == 0)):
                 
                 if warnings:
                     st.warning("⚠️ 警告:")
@@ -1347,6 +1430,9 @@ class TransportPage:
                     st.info("この日の積載予定はありません")
                     continue
                 
+                if date_idx > 0 and not st.checkbox("積載明細を表示", key=f"daily_view_show_{date_str}"):
+                    continue
+                
                 for i, truck_plan in enumerate(trucks, 1):
                     st.markdown(f"**🚛 便 #{i}: {truck_plan.get('truck_name', 'トラック名不明')}**")
                     
@@ -1360,19 +1446,36 @@ class TransportPage:
                     loaded_items = truck_plan.get('loaded_items', [])
                     
                     if loaded_items:
-                        # ✅ 修正: container_nameフィールドも確認
-                        items_df = pd.DataFrame([{
-                            '製品コード': item.get('product_code', ''),
-                            '製品名': item.get('product_name', ''),
-                            '容器名': item.get('container_name', '不明'),  # ← 追加
-                            '容器数': item.get('num_containers', 0),
-                            '合計数量': item.get('total_quantity', 0),
-                            '床面積': f"{item.get('floor_area', 0):.2f}m²",  # ← 追加
-                            '納期': item['delivery_date'].strftime('%Y-%m-%d') if 'delivery_date' in item else '',
-                            '前倒し': '✓' if item.get('is_advanced', False) else '',  # ← 追加
-                        } for item in loaded_items])
+                        # ✅ 列ごとのリストを1パスで作成してからDataFrame化（行ごとのdict生成を避ける）
+                        cols = {
+                            '製品コード': [], '製品名': [], '容器名': [], '容器数': [],
+                            '合計数量': [], '床面積': [], '納期': [], '前倒し': []
+                        }
+                        for item in loaded_items:
+                            cols['製品コード'].append(item.get('product_code', ''))
+                            cols['製品名'].append(item.get('product_name', ''))
+                            cols['容器名'].append(item.get('container_name', '不明'))
+                            cols['容器数'].append(item.get('num_containers', 0))
+                            cols['合計数量'].append(item.get('total_quantity', 0))
+                            cols['床面積'].append(item.get('floor_area', 0))
+                            cols['納期'].append(item.get('delivery_date'))
+                            cols['前倒し'].append(item.get('is_advanced', False))
+                        items_df = pd.DataFrame(cols)
                         
-                        st.dataframe(items_df, use_container_width=True, hide_index=True)
+                        # 床面積・納期は数値/日付のまま渡し、表示書式はcolumn_configに任せる
+                        items_df['床面積'] = pd.to_numeric(items_df['床面積'], errors='coerce').fillna(0).astype(float)
+                        items_df['納期'] = pd.to_datetime(items_df['納期'], errors='coerce', format='mixed')
+                        items_df['前倒し'] = np.where(items_df['前倒し'].fillna(False).astype(bool), '✓', '')
+                        
+                        st.dataframe(
+                            items_df,
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                "床面積": st.column_config.NumberColumn("床面積", format="%.2f m²"),
+                                "納期": st.column_config.DateColumn("納期", format="YYYY-MM-DD"),
+                            }
+                        )
                     else:
                         st.info("積載品がありません")
                     
@@ -1381,7 +1484,11 @@ class TransportPage:
     def _show_list_view(self, daily_plans):
         """一覧表示"""
         
-        all_items = []
+        # ✅ 列ごとのリストに直接追加（行dictを作らずにDataFrame化）
+        cols = {
+            '積載日': [], 'トラック': [], '製品コード': [], '製品名': [],
+            '容器数': [], '合計数量': [], '納期': [], '体積率': []
+        }
         
         for date_str in sorted(daily_plans.keys()):
             plan = daily_plans[date_str]
@@ -1392,31 +1499,44 @@ class TransportPage:
                 loaded_items = truck_plan.get('loaded_items', [])
                 truck_name = truck_plan.get('truck_name', 'トラック名不明')
                 utilization = truck_plan.get('utilization', {})
+                volume_rate_str = f"{utilization.get('volume_rate', 0)}%"
                 
                 for item in loaded_items:
-                    delivery_date = item.get('delivery_date')
-                    if delivery_date:
-                        if hasattr(delivery_date, 'strftime'):
-                            delivery_date_str = delivery_date.strftime('%Y-%m-%d')
-                        else:
-                            delivery_date_str = str(delivery_date)
-                    else:
-                        delivery_date_str = '-'
-                    
-                    all_items.append({
-                        '積載日': date_str,
-                        'トラック': truck_name,
-                        '製品コード': item.get('product_code', ''),
-                        '製品名': item.get('product_name', ''),
-                        '容器数': item.get('num_containers', 0),
-                        '合計数量': item.get('total_quantity', 0),
-                        '納期': delivery_date_str,
-                        '体積率': f"{utilization.get('volume_rate', 0)}%"
-                    })
+                    cols['積載日'].append(date_str)
+                    cols['トラック'].append(truck_name)
+                    cols['製品コード'].append(item.get('product_code', ''))
+                    cols['製品名'].append(item.get('product_name', ''))
+                    cols['容器数'].append(item.get('num_containers', 0))
+                    cols['合計数量'].append(item.get('total_quantity', 0))
+                    cols['納期'].append(item.get('delivery_date'))
+                    cols['体積率'].append(volume_rate_str)
         
-        if all_items:
-            df = pd.DataFrame(all_items)
-            st.dataframe(df, width='stretch')
+        if cols['積載日']:
+            df = pd.DataFrame(cols, copy=False)
+            df['トラック'] = df['トラック'].astype('category')
+            df['納期'] = _fmt_dates(df['納期'], na_rep='-')  # 日付整形は列単位で1回
+            # ✅ Arrow型の列にしておき、st.dataframe送信時のobject→Arrow変換を省く
+            df = df.convert_dtypes(dtype_backend='pyarrow')
+            
+            # ✅ ページ単位で描画（長期間の計画でもフロントへ送る行数を抑える）
+            col_size, col_page = st.columns(2)
+            with col_size:
+                page_size = st.selectbox("行数", options=[50, 100, 500], index=0, key="list_view_page_size")
+            total_pages = max(1, math.ceil(len(df) / page_size))
+            with col_page:
+                page = st.number_input(
+                    f"ページ（全{total_pages}ページ）",
+                    min_value=1,
+                    max_value=total_pages,
+                    value=1,
+                    step=1,
+                    key="list_view_page"
+                )
+            
+            start = (int(page) - 1) * page_size
+            st.dataframe(df.iloc[start:start + page_size], width='stretch')
+            st.caption(f"{len(df)} 件中 {start + 1}〜{min(start + page_size, len(df))} 件を表示")
+        else:
             st.info("表示するデータがありません")
 
     def _show_container_management(self):
@@ -1437,88 +1557,37 @@ class TransportPage:
             if can_edit and container_data:
                 success = self.service.create_container(container_data)
                 if success:
+                    _load_containers.clear()
                     st.success(f"容器 '{container_data['name']}' を登録しました")
                     st.rerun()
                 else:
                     st.error("容器登録に失敗しました")
 
             st.subheader("登録済み容器一覧")
-            containers = self.service.get_containers()
+            containers = _load_containers(self.service, self._cache_key())
 
             if containers:
-                for container in containers:
-                    with st.expander(f"📦 {container.name} (ID: {container.id})"):
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.write(f"**寸法:** {container.width} × {container.depth} × {container.height} mm")
-                            st.write(f"**体積:** {(container.width * container.depth * container.height) / 1000000000:.3f} m³")
-                        
-                        with col2:
-                            st.write(f"**最大重量:** {container.max_weight} kg")
-                            st.write(f"**積重可:** {'✅' if container.stackable else '❌'}")
-                            max_stack = getattr(container, 'max_stack', 1)
-                            st.write(f"**最大段数:** {max_stack}段")
+                # ✅ 体積は1回だけ配列で計算し、各容器の行と統計で共用
+                volumes_m3 = np.fromiter(
+                    (c.width * c.depth * c.height for c in containers), dtype=np.int64, count=len(containers)
+                ) / 1000000000
 
-                        with st.form(f"edit_container_form_{container.id}"):
-                            st.write("✏️ 容器情報を編集")
-
-                            col_a, col_b = st.columns(2)
-                            
-                            with col_a:
-                                new_container_code = st.text_input("容器コード", value=container.container_code)
-                                new_name = st.text_input("容器名", value=container.name)
-                                new_width = st.number_input("幅 (mm)", min_value=1, value=container.width)
-                                new_depth = st.number_input("奥行 (mm)", min_value=1, value=container.depth)
-                                new_height = st.number_input("高さ (mm)", min_value=1, value=container.height)
-                            
-                            with col_b:
-                                new_weight = st.number_input("最大重量 (kg)", min_value=0, value=container.max_weight)
-                                new_stackable = st.checkbox("積重可", value=bool(container.stackable))
-                                new_max_stack = st.number_input(
-                                    "最大積み重ね段数", 
-                                    min_value=1, 
-                                    max_value=10, 
-                                    value=getattr(container, 'max_stack', 1)
-                                )
-
-                            submitted = st.form_submit_button("更新", type="primary", disabled=not can_edit)
-                            if submitted:
-                                update_data = {
-                                    "container_code": new_container_code,
-                                    # "container_code": new_container_code.strip() if new_container_code else None,
-                                    "name": new_name,
-                                    "width": new_width,
-                                    "depth": new_depth,
-                                    "height": new_height,
-                                    "max_weight": new_weight,
-                                    "stackable": int(new_stackable),
-                                    "max_stack": new_max_stack
-                                }
-                                success = self.service.update_container(container.id, update_data)
-                                if success:
-                                    st.success(f"✅ 容器 '{container.name}' を更新しました")
-                                    st.rerun()
-                                else:
-                                    st.error("❌ 容器更新に失敗しました")
-
-                        if st.button("🗑️ 削除", key=f"delete_container_{container.id}", disabled=not can_edit):
-                            success = self.service.delete_container(container.id)
-                            if success:
-                                st.success(f"容器 '{container.name}' を削除しました")
-                                st.rerun()
-                            else:
-                                st.error("容器削除に失敗しました")
+                # ✅ 容器ごとの表示・編集はフラグメント化（編集フォームの操作で他の容器を再描画しない）
+                for container, volume_m3 in zip(containers, volumes_m3):
+                    self._show_container_row(container, float(volume_m3), can_edit)
 
                 st.subheader("容器統計")
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     st.metric("登録容器数", len(containers))
+                weights = np.fromiter(
+                    (c.max_weight for c in containers), dtype=np.float64, count=len(containers)
+                )
                 with col2:
-                    avg_volume = sum((c.width * c.depth * c.height) for c in containers) / len(containers) / 1000000000
+                    avg_volume = volumes_m3.mean()
                     st.metric("平均体積", f"{avg_volume:.2f} m³")
                 with col3:
-                    avg_weight = sum(c.max_weight for c in containers) / len(containers)
+                    avg_weight = weights.mean()
                     st.metric("平均最大重量", f"{avg_weight:.1f} kg")
 
             else:
@@ -1527,6 +1596,78 @@ class TransportPage:
         except Exception as e:
             st.error(f"容器管理エラー: {e}")
 
+    @st.fragment
+    def _show_container_row(self, container, volume_m3: float, can_edit: bool):
+        """容器1件分の表示・編集（フラグメント: 編集フォームの操作時はこの行だけ再実行）"""
+        try:
+            # 更新・削除は全体を再実行するため、フラグメント単独の再実行では渡された容器をそのまま使う
+            with st.expander(f"📦 {container.name} (ID: {container.id})"):
+                # ✅ 読み取り専用の情報は1つのmarkdownにまとめて出力
+                max_stack = getattr(container, 'max_stack', 1)
+                st.markdown(
+                    f"**寸法:** {container.width} × {container.depth} × {container.height} mm  \n"
+                    f"**体積:** {volume_m3:.3f} m³  \n"
+                    f"**最大重量:** {container.max_weight} kg  \n"
+                    f"**積重可:** {'✅' if container.stackable else '❌'}  \n"
+                    f"**最大段数:** {max_stack}段"
+                )
+
+                # ✅ 編集フォームはチェック時のみ作成（一覧表示時の入力ウィジェット生成を省く）
+                if st.checkbox("✏️ 編集", key=f"toggle_edit_container_{container.id}"):
+                    with st.form(f"edit_container_form_{container.id}"):
+                        st.write("✏️ 容器情報を編集")
+
+                        col_a, col_b = st.columns(2)
+
+                        with col_a:
+                            new_container_code = st.text_input("容器コード", value=container.container_code)
+                            new_name = st.text_input("容器名", value=container.name)
+                            new_width = st.number_input("幅 (mm)", min_value=1, value=container.width)
+                            new_depth = st.number_input("奥行 (mm)", min_value=1, value=container.depth)
+                            new_height = st.number_input("高さ (mm)", min_value=1, value=container.height)
+
+                        with col_b:
+                            new_weight = st.number_input("最大重量 (kg)", min_value=0, value=container.max_weight)
+                            new_stackable = st.checkbox("積重可", value=bool(container.stackable))
+                            new_max_stack = st.number_input(
+                                "最大積み重ね段数", 
+                                min_value=1, 
+                                max_value=10, 
+                                value=max_stack
+                            )
+
+                        submitted = st.form_submit_button("更新", type="primary", disabled=not can_edit)
+                        if submitted:
+                            update_data = {
+                                "container_code": new_container_code,
+                                # "container_code": new_container_code.strip() if new_container_code else None,
+                                "name": new_name,
+                                "width": new_width,
+                                "depth": new_depth,
+                                "height": new_height,
+                                "max_weight": new_weight,
+                                "stackable": int(new_stackable),
+                                "max_stack": new_max_stack
+                            }
+                            success = self.service.update_container(container.id, update_data)
+                            if success:
+                                _load_containers.clear()
+                                st.success(f"✅ 容器 '{container.name}' を更新しました")
+                                st.rerun()  # 体積・統計も更新後の寸法で再計算
+                            else:
+                                st.error("❌ 容器更新に失敗しました")
+
+                if st.button("🗑️ 削除", key=f"delete_container_{container.id}", disabled=not can_edit):
+                    success = self.service.delete_container(container.id)
+                    if success:
+                        _load_containers.clear()
+                        st.success(f"容器 '{container.name}' を削除しました")
+                        st.rerun()
+                    else:
+                        st.error("容器削除に失敗しました")
+        except Exception as e:
+            st.error(f"容器管理エラー: {e}")
+
     def _show_truck_management(self):
         """トラック管理表示"""
         st.header("🚛 トラック管理")
@@ -1545,16 +1686,18 @@ class TransportPage:
             if can_edit and truck_data:
                 success = self.service.create_truck(truck_data)
                 if success:
+                    _load_trucks.clear()
                     st.success(f"トラック '{truck_data['name']}' を登録しました")
                     st.rerun()
                 else:
                     st.error("トラック登録に失敗しました")
 
             st.subheader("登録済みトラック一覧")
-            trucks_df = self.service.get_trucks()
+            trucks_df = _load_trucks(self.service, self._cache_key())
 
             if not trucks_df.empty:
-                for _, truck in trucks_df.iterrows():
+                # ✅ 行ごとのSeries生成を避け、dictのリストに一括変換して反復
+                for truck in trucks_df.to_dict('records'):
                     with st.expander(f"🛻 {truck['name']} (ID: {truck['id']})"):
                         col1, col2 = st.columns(2)
                         
@@ -1569,60 +1712,64 @@ class TransportPage:
                             st.write(f"**到着時刻:** {truck['arrival_time']} (+{truck['arrival_day_offset']}日)")
                             st.write(f"**デフォルト便:** {'✅' if truck['default_use'] else '❌'}")
                             st.write(f"**優先積載製品:** {truck['priority_product_codes'] or 'なし'}")  # 新規表示
-                        with st.form(f"edit_truck_form_{truck['id']}"):
-                            st.write("✏️ トラック情報を編集")
+                        # ✅ 編集フォームはチェック時のみ作成（一覧表示時の入力ウィジェット生成を省く）
+                        if st.checkbox("✏️ 編集", key=f"toggle_edit_truck_{truck['id']}"):
+                            with st.form(f"edit_truck_form_{truck['id']}"):
+                                st.write("✏️ トラック情報を編集")
 
-                            col_a, col_b = st.columns(2)
+                                col_a, col_b = st.columns(2)
                             
-                            with col_a:
-                                new_name = st.text_input("トラック名", value=truck['name'])
-                                new_width = st.number_input("荷台幅 (mm)", min_value=1, value=int(truck['width']))
-                                new_depth = st.number_input("荷台奥行 (mm)", min_value=1, value=int(truck['depth']))
-                                new_height = st.number_input("荷台高さ (mm)", min_value=1, value=int(truck['height']))
-                                new_weight = st.number_input("最大積載重量 (kg)", min_value=1, value=int(truck['max_weight']))
+                                with col_a:
+                                    new_name = st.text_input("トラック名", value=truck['name'])
+                                    new_width = st.number_input("荷台幅 (mm)", min_value=1, value=int(truck['width']))
+                                    new_depth = st.number_input("荷台奥行 (mm)", min_value=1, value=int(truck['depth']))
+                                    new_height = st.number_input("荷台高さ (mm)", min_value=1, value=int(truck['height']))
+                                    new_weight = st.number_input("最大積載重量 (kg)", min_value=1, value=int(truck['max_weight']))
                             
-                            with col_b:
-                                new_dep = st.time_input("出発時刻", value=truck['departure_time'])
-                                new_arr = st.time_input("到着時刻", value=truck['arrival_time'])
-                                new_offset = st.number_input(
-                                    "到着日オフセット（日）", 
-                                    min_value=0, 
-                                    max_value=7, 
-                                    value=int(truck['arrival_day_offset'])
-                                )
-                                new_default = st.checkbox("デフォルト便", value=bool(truck['default_use']))
-                                # 追加：優先積載製品コード入力欄
-                                new_priority = st.text_input(
-                                    "優先積載製品コード（カンマ区切り）",
-                                    value=truck.get('priority_product_codes', '') or '',
-                                    placeholder="例: PRD001,PRD002"
-                                )
-                            submitted = st.form_submit_button("更新", type="primary", disabled=not can_edit)
-                            if submitted:
-                                update_data = {
-                                    "name": new_name,
-                                    "width": new_width,
-                                    "depth": new_depth,
-                                    "height": new_height,
-                                    "max_weight": new_weight,
-                                    "departure_time": new_dep,
-                                    "arrival_time": new_arr,
-                                    "arrival_day_offset": new_offset,
-                                    "default_use": new_default,
-                                    # 新規追加：優先積載製品コード
-                                    "priority_product_codes": new_priority.strip() if new_priority else None
-
-                                }
-                                success = self.service.update_truck(truck['id'], update_data)
-                                if success:
-                                    st.success(f"✅ トラック '{truck['name']}' を更新しました")
-                                    st.rerun()
-                                else:
-                                    st.error("❌ トラック更新に失敗しました")
+                                with col_b:
+                                    new_dep = st.time_input("出発時刻", value=truck['departure_time'])
+                                    new_arr = st.time_input("到着時刻", value=truck['arrival_time'])
+                                    new_offset = st.number_input(
+                                        "到着日オフセット（日）", 
+                                        min_value=0, 
+                                        max_value=7, 
+                                        value=int(truck['arrival_day_offset'])
+                                    )
+                                    new_default = st.checkbox("デフォルト便", value=bool(truck['default_use']))
+                                    # 追加：優先積載製品コード入力欄
+                                    new_priority = st.text_input(
+                                        "優先積載製品コード（カンマ区切り）",
+                                        value=truck.get('priority_product_codes', '') or '',
+                                        placeholder="例: PRD001,PRD002"
+                                    )
+                                submitted = st.form_submit_button("更新", type="primary", disabled=not can_edit)
+                                if submitted:
+                                    update_data = {
+                                        "name": new_name,
+                                        "width": new_width,
+                                        "depth": new_depth,
+                                        "height": new_height,
+                                        "max_weight": new_weight,
+                                        "departure_time": new_dep,
+                                        "arrival_time": new_arr,
+                                        "arrival_day_offset": new_offset,
+                                        "default_use": new_default,
+                                        # 新規追加：優先積載製品コード
+                                        "priority_product_codes": new_priority.strip() if new_priority else None
+
+                                    }
+                                    success = self.service.update_truck(truck['id'], update_data)
+                                    if success:
+                                        _load_trucks.clear()
+                                        st.success(f"✅ トラック '{truck['name']}' を更新しました")
+                                        st.rerun()
+                                    else:
+                                        st.error("❌ トラック更新に失敗しました")
 
                         if st.button("🗑️ 削除", key=f"delete_truck_{truck['id']}", disabled=not can_edit):
                             success = self.service.delete_truck(truck['id'])
                             if success:
+                                _load_trucks.clear()
                                 st.success(f"トラック '{truck['name']}' を削除しました")
                                 st.rerun()
                             else:
@@ -1637,52 +1784,55 @@ class TransportPage:
                         edited_df: pd.DataFrame, row_id_map: Dict) -> bool:
         """計画の変更を保存（容器数・積載率自動計算対応）"""
         try:
-            changes_detected = False
             updates = []
             
-            # 必要な情報を取得
-            try:
-                products_df = self.service.product_repo.get_all_products()
-                capacity_map = dict(zip(products_df['product_code'], products_df['capacity']))
-            except:
-                capacity_map = {}
-                st.warning("製品容量情報の取得に失敗しました")
-            
-            # 変更を検出
-            for row_idx in range(len(original_df)):
-                original_row = original_df.iloc[row_idx]
-                edited_row = edited_df.iloc[row_idx]
-                
-                # 変更があったフィールドを検出
-                changes = {}
-                old_values = {}
-                
-                # 数量または積載率が変更された場合
-                if (original_row['合計数量'] != edited_row['合計数量'] or
-                    original_row['体積率(%)'] != edited_row['体積率(%)']):
-                    
-                    changes['total_quantity'] = edited_row['合計数量']
-                    changes['num_containers'] = edited_row['容器数']
-                    changes['volume_utilization'] = edited_row['体積率(%)']
-                    
-                    old_values['total_quantity'] = original_row['合計数量']
-                    old_values['num_containers'] = original_row['容器数']
-                    old_values['volume_utilization'] = original_row['体積率(%)']
+            # ✅ 変更を一括検出（数量または積載率が変わった行）
+            changed_mask = (
+                (original_df['合計数量'].to_numpy() != edited_df['合計数量'].to_numpy())
+                | (original_df['体積率(%)'].to_numpy() != edited_df['体積率(%)'].to_numpy())
+            )
+            changed_rows = np.flatnonzero(changed_mask)
+            changes_detected = changed_rows.size > 0
+            
+            value_columns = ['合計数量', '容器数', '体積率(%)']
+            new_records = edited_df.loc[changed_mask, value_columns].to_dict('records')
+            old_records = original_df.loc[changed_mask, value_columns].to_dict('records')
+            
+            # ✅ 明細IDは索引を1回作って引く（行ごとの明細全件走査をしない）
+            detail_index = self._build_detail_index(plan_data) if changes_detected else {}
+            daily_plans = plan_data.get('daily_plans', {})
+            saved_items = []  # 保存成功時に計画データへ反映する (明細item, changes)
+            
+            for row_idx, new_row, old_row in zip(changed_rows, new_records, old_records):
+                changes = {
+                    'total_quantity': new_row['合計数量'],
+                    'num_containers': new_row['容器数'],
+                    'volume_utilization': new_row['体積率(%)']
+                }
+                old_values = {
+                    'total_quantity': old_row['合計数量'],
+                    'num_containers': old_row['容器数'],
+                    'volume_utilization': old_row['体積率(%)']
+                }
                 
-                if changes:
-                    changes_detected = True
+                # detail_idを取得（row_id_mapのキーはplan_dfの行番号＝インデックス）
+                row_key = original_df.index[row_idx]
+                if row_key in row_id_map:
+                    date_str, truck_idx, item_idx = row_id_map[row_key]
+                    try:
+                        truck = daily_plans[date_str]['trucks'][truck_idx]
+                        product_code = truck['loaded_items'][item_idx]['product_code']
+                    except (KeyError, IndexError, TypeError):
+                        continue
+                    detail_id = detail_index.get((date_str, truck['truck_id'], product_code))
                     
-                    # detail_idを取得
-                    if row_idx in row_id_map:
-                        date_str, truck_idx, item_idx = row_id_map[row_idx]
-                        detail_id = self._find_detail_id(plan_data, date_str, truck_idx, item_idx)
-                        
-                        if detail_id:
-                            updates.append({
-                                'detail_id': detail_id,
-                                'changes': changes,
-                                'old_values': old_values
-                            })
+                    if detail_id:
+                        updates.append({
+                            'detail_id': detail_id,
+                            'changes': changes,
+                            'old_values': old_values
+                        })
+                        saved_items.append((truck['loaded_items'][item_idx], changes))
             
             if changes_detected and updates:
                 # サービスを通じて更新
@@ -1691,6 +1841,11 @@ class TransportPage:
                 if success:
                     st.success(f"✅ {len(updates)}件の変更を保存しました")
                     
+                    # 保存した数量を計画データにも反映（納入進度は保存後の数量で集計）
+                    for item, changes in saved_items:
+                        item['total_quantity'] = changes['total_quantity']
+                        item['num_containers'] = changes['num_containers']
+                    
                     # delivery_progressも更新
                     self._update_delivery_progress_from_plan(plan_data)
                     return True
@@ -1704,20 +1859,13 @@ class TransportPage:
             st.error(f"保存エラー: {str(e)}")
             return False    
 
-    def _find_detail_id(self, plan_data: Dict, date_str: str, truck_idx: int, item_idx: int) -> int:
-        """明細IDを検索"""
-        try:
-            details = plan_data.get('details', [])
-            
-            for detail in details:
-                if (str(detail.get('loading_date')) == date_str and 
-                    detail.get('truck_id') == plan_data['daily_plans'][date_str]['trucks'][truck_idx]['truck_id'] and
-                    detail.get('product_code') == plan_data['daily_plans'][date_str]['trucks'][truck_idx]['loaded_items'][item_idx]['product_code']):
-                    return detail['id']
-            
-            return None
-        except:
-            return None
+    def _build_detail_index(self, plan_data: Dict) -> Dict:
+        """明細IDの索引を作成 {(積載日, truck_id, product_code): detail_id}（同一キーは先頭を採用）"""
+        index = {}
+        for detail in plan_data.get('details', []):
+            key = (str(detail.get('loading_date')), detail.get('truck_id'), detail.get('product_code'))
+            index.setdefault(key, detail.get('id'))
+        return index
 
     def _update_delivery_progress_from_plan(self, plan_data: Dict):
         """計画変更に基づいてdelivery_progressを更新"""
@@ -1725,14 +1873,31 @@ class TransportPage:
             # 計画からdelivery_progressへの数量更新ロジック
             daily_plans = plan_data.get('daily_plans', {})
             
-            for date_str, day_plan in daily_plans.items():
-                for truck in day_plan.get('trucks', []):
-                    for item in truck.get('loaded_items', []):
-                        # delivery_progressのplanned_quantityを更新
-                        update_data = {
-                            'planned_quantity': item.get('total_quantity', 0)
-                        }
-                        # ここでdelivery_progressを更新するロジックを実装
+            # ✅ 積載日×トラック×明細を1つのDataFrameに展開し、(製品ID, 積載日)ごとに計画数を集計
+            records = [
+                {'date': date_str, 'trucks': [{'loaded_items': t.get('loaded_items', [])} for t in day_plan.get('trucks', [])]}
+                for date_str, day_plan in daily_plans.items()
+            ]
+            flat = pd.json_normalize(records, record_path=['trucks', 'loaded_items'], meta=['date'])
+            
+            updates = []
+            if not flat.empty and 'product_id' in flat.columns:
+                if 'total_quantity' not in flat.columns:
+                    flat['total_quantity'] = 0
+                flat['total_quantity'] = pd.to_numeric(flat['total_quantity'], errors='coerce').fillna(0)
+                planned = (
+                    flat.dropna(subset=['product_id'])
+                    .groupby(['product_id', 'date'], sort=False, as_index=False)['total_quantity'].sum()
+                )
+                updates = [
+                    {'product_id': int(product_id), 'delivery_date': date_str, 'planned_quantity': int(quantity)}
+                    for product_id, date_str, quantity in zip(
+                        planned['product_id'].tolist(), planned['date'].tolist(), planned['total_quantity'].tolist()
+                    )
+                ]
+            
+            # 1回の一括更新で反映
+            self.service.bulk_update_delivery_progress(updates)
                         
             st.info("納入進度も更新しました")
             
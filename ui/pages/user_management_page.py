@@ -3,17 +3,166 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 import logging
-
-# ロガー設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('user_management.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+import atexit
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# ロガー設定（モジュールの再インポートでハンドラが重複しないよう一度だけ行う。
+# ファイル書き込みはQueueListenerのバックグラウンドスレッドで行う）
+# 権限変更の監査ログを出すAuthServiceのロガーも同じファイルに出力する
 logger = logging.getLogger(__name__)
+_AUDIT_LOGGER_NAMES = (__name__, 'services.auth_service')
+if not logger.handlers:
+    _log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    _file_handler = RotatingFileHandler('user_management.log', maxBytes=1_000_000, backupCount=3,
+                                        encoding='utf-8', delay=True)
+    _file_handler.setFormatter(_log_formatter)
+    _stream_handler = logging.StreamHandler()
+    _stream_handler.setFormatter(_log_formatter)
+
+    _log_queue = queue.SimpleQueue()
+    _log_listener = QueueListener(_log_queue, _file_handler, _stream_handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+    _queue_handler = QueueHandler(_log_queue)
+    for _logger_name in _AUDIT_LOGGER_NAMES:
+        _audit_logger = logging.getLogger(_logger_name)
+        _audit_logger.addHandler(_queue_handler)
+        _audit_logger.setLevel(logging.INFO)
+        _audit_logger.propagate = False
+
+# 権限設定の対象ページ一覧
+AVAILABLE_PAGES: tuple = (
+    "ダッシュボード",
+    "CSV受注取込",
+    "製品管理",
+    "制限設定",
+    "生産計画",
+    "配送便計画",
+    "納入進度",
+    "📋 出荷指示書",
+    "📦 枚方集荷依頼書",
+    "📅 会社カレンダー",
+    "ユーザー管理",
+    "連絡先管理",
+)
+
+# タブ権限を設定できるページとそのタブ
+PAGE_TABS: dict = {
+    "生産計画": (
+        "📊 計画シミュレーション",
+        "📝 生産計画管理",
+        "🔧 製造工程（加工対象）",
+    ),
+    "配送便計画": (
+        "🚛 積載計画",
+        "📦 出荷管理",
+    ),
+}
+
+# 権限設定表（st.data_editor）の列設定
+PERMISSION_COLUMN_CONFIG = {
+    "name": st.column_config.TextColumn("名称"),
+    "can_view": st.column_config.CheckboxColumn("閲覧"),
+    "can_edit": st.column_config.CheckboxColumn("編集"),
+}
+
+# 読み取りクエリの並列実行用スレッドプール（DBセッションはscoped_sessionでスレッドごとに分離）
+_READ_POOL = ThreadPoolExecutor(max_workers=3, thread_name_prefix='user_mgmt_read')
+
+
+# ✅ ユーザー・ロール・権限の取得キャッシュ（更新操作の後に該当キャッシュをクリア）
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_users(_auth) -> pd.DataFrame:
+    """全ユーザーを取得（キャッシュ付き）"""
+    return _auth.get_all_users()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_roles(_auth) -> pd.DataFrame:
+    """全ロールを取得（キャッシュ付き）"""
+    return _auth.get_all_roles()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_user_roles_map(_auth, user_ids: tuple) -> dict:
+    """全ユーザーのロール割り当てを1クエリで取得（キャッシュ付き）"""
+    return _auth.get_user_roles_map(list(user_ids))
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_user_detail(_auth, user_id: int):
+    """ユーザー詳細（SMTP設定含む）を取得（キャッシュ付き）"""
+    return _auth.get_user_detail(user_id)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_page_permissions(_auth, role_id: int) -> pd.DataFrame:
+    """ロールのページ権限を取得（キャッシュ付き）"""
+    return _auth.get_page_permissions(role_id)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_tab_permissions(_auth, role_id: int, page_name: str) -> pd.DataFrame:
+    """ロールのタブ権限を取得（キャッシュ付き）"""
+    return _auth.get_tab_permissions(role_id, page_name)
+
+
+@st.cache_data(show_spinner=False)
+def _format_users_df(users_df: pd.DataFrame) -> pd.DataFrame:
+    """ユーザー一覧を表示用に整形（キャッシュ付き、元のDataFrameは変更しない）"""
+    display_df = users_df.copy()
+    display_df['is_active'] = display_df['is_active'].map({1: '有効', 0: '無効'})
+    display_df['is_admin'] = display_df['is_admin'].map({1: '管理者', 0: '一般'})
+
+    # 日時を見やすく整形
+    if 'last_login' in display_df.columns:
+        display_df['last_login'] = pd.to_datetime(display_df['last_login'], errors='coerce').dt.strftime('%Y-%m-%d %H:%M')
+    return display_df
+
+
+@st.cache_data(show_spinner=False)
+def _index_by_id(df: pd.DataFrame) -> pd.DataFrame:
+    """id列をインデックスにしたDataFrameを返す（.locでの行参照用、キャッシュ付き）"""
+    return df.set_index('id', drop=False)
+
+
+@st.cache_data(show_spinner=False)
+def _user_options(users_df: pd.DataFrame) -> dict:
+    """ユーザー選択肢 {"ユーザー名 (氏名)": id} を作成（キャッシュ付き）"""
+    # string型のまま列単位で連結（氏名未登録は空文字）
+    labels = (
+        users_df['username'].astype('string')
+        .str.cat(users_df['full_name'].astype('string').fillna(''), sep=' (')
+        + ')'
+    )
+    return dict(zip(labels, users_df['id']))
+
+
+@st.cache_data(show_spinner=False)
+def _role_options(roles_df: pd.DataFrame) -> dict:
+    """ロール選択肢 {ロール名: id} を作成（キャッシュ付き）"""
+    return dict(zip(roles_df['role_name'], roles_df['id']))
+
+
+def _permissions_frame(names, perm_dict: dict) -> pd.DataFrame:
+    """ページ/タブ名と現在の権限から権限設定表のDataFrameを作成"""
+    return pd.DataFrame({
+        'name': list(names),
+        'can_view': [perm_dict.get(name, {}).get('can_view', False) for name in names],
+        'can_edit': [perm_dict.get(name, {}).get('can_edit', False) for name in names],
+    })
+
+
+def _permission_settings(edited_df: pd.DataFrame) -> dict:
+    """編集後の権限設定表を {名称: {'can_view': bool, 'can_edit': bool}} に変換"""
+    return {
+        name: {'can_view': bool(can_view), 'can_edit': bool(can_edit)}
+        for name, can_view, can_edit in zip(edited_df['name'], edited_df['can_view'], edited_df['can_edit'])
+    }
+
 
 class UserManagementPage:
     """ユーザー管理画面"""
@@ -32,42 +181,47 @@ class UserManagementPage:
             st.error("⛔ この画面は管理者のみアクセス可能です")
             return
 
+        # ✅ ユーザー・ロールは1回だけ取得して各タブで共有
+        # 各タブはフラグメントのため、タブ内の操作ではそのタブだけが再実行される
+        try:
+            # 互いに独立したクエリなので並列に発行して待ち時間を重ねる
+            fu_users = _READ_POOL.submit(_load_users, self.auth_service)
+            fu_roles = _READ_POOL.submit(_load_roles, self.auth_service)
+            users_df, roles_df = fu_users.result(), fu_roles.result()
+        except Exception as e:
+            st.error(f"ユーザー・ロール取得エラー: {e}")
+            return
+
         tab1, tab2, tab3, tab4 = st.tabs(["👤 ユーザー一覧", "➕ 新規登録", "🎭 ロール管理", "🔐 権限設定"])
 
         with tab1:
-            self._show_user_list()
+            self._show_user_list(users_df, current_user['id'])
 
         with tab2:
             self._show_user_creation()
 
         with tab3:
-            self._show_role_management()
+            self._show_role_management(users_df, roles_df)
 
         with tab4:
-            self._show_permission_management()
+            self._show_permission_management(roles_df)
 
 
-    def _show_user_list(self):
+    @st.fragment
+    def _show_user_list(self, users_df: pd.DataFrame, current_user_id: int):
         """ユーザー一覧表示"""
         st.subheader("👤 ユーザー一覧")
 
         try:
-            users_df = self.auth_service.get_all_users()
-
             if users_df.empty:
                 st.info("ユーザーが登録されていません")
                 return
 
-            # 表示用に整形
-            users_df['is_active'] = users_df['is_active'].map({1: '有効', 0: '無効'})
-            users_df['is_admin'] = users_df['is_admin'].map({1: '管理者', 0: '一般'})
-
-            # 日時を見やすく整形
-            if 'last_login' in users_df.columns:
-                users_df['last_login'] = pd.to_datetime(users_df['last_login']).dt.strftime('%Y-%m-%d %H:%M')
+            # 表示用に整形（編集フォームの初期値は整形前の0/1を使用）
+            display_df = _format_users_df(users_df)
 
             st.dataframe(
-                users_df,
+                display_df,
                 use_container_width=True,
                 hide_index=True,
                 column_config={
@@ -87,19 +241,16 @@ class UserManagementPage:
             st.subheader("📝 ユーザー編集")
 
             if not users_df.empty:
-                user_options = {
-                    f"{row['username']} ({row['full_name']})": row['id']
-                    for _, row in users_df.iterrows()
-                }
+                user_options = _user_options(users_df)
 
                 selected_user = st.selectbox("編集するユーザーを選択", options=list(user_options.keys()))
 
                 if selected_user:
                     user_id = user_options[selected_user]
-                    user_data = users_df[users_df['id'] == user_id].iloc[0]
+                    user_data = _index_by_id(users_df).loc[user_id]
 
                     # ユーザーの詳細情報を取得（SMTP設定含む）
-                    user_detail = self.auth_service.get_user_detail(user_id)
+                    user_detail = _load_user_detail(self.auth_service, int(user_id))
 
                     with st.form(f"edit_user_{user_id}"):
                         col1, col2 = st.columns(2)
@@ -111,9 +262,9 @@ class UserManagementPage:
 
                         with col2:
                             new_is_active = st.selectbox("状態", options=['有効', '無効'],
-                                                        index=0 if user_data['is_active'] == '有効' else 1)
+                                                        index=0 if user_data['is_active'] == 1 else 1)
                             new_is_admin = st.selectbox("種別", options=['一般', '管理者'],
-                                                       index=1 if user_data['is_admin'] == '管理者' else 0)
+                                                       index=1 if user_data['is_admin'] == 1 else 0)
 
                         # SMTP設定セクション
                         st.markdown("---")
@@ -170,6 +321,8 @@ class UserManagementPage:
 
                                 try:
                                     self.auth_service.update_user(user_id, update_data)
+                                    _load_users.clear()
+                                    _load_user_detail.clear()
                                     st.success("✅ ユーザー情報を更新しました")
                                     st.rerun()
                                 except Exception as e:
@@ -180,12 +333,13 @@ class UserManagementPage:
 
                             if delete_clicked:
                                 # 自分自身は削除できない
-                                current_user = st.session_state.get('user')
-                                if current_user['id'] == user_id:
+                                if current_user_id == user_id:
                                     st.error("自分自身のアカウントは削除できません")
                                 else:
                                     try:
                                         self.auth_service.delete_user(user_id)
+                                        _load_users.clear()
+                                        _load_user_detail.clear()
                                         st.success("✅ ユーザーを削除しました")
                                         st.rerun()
                                     except Exception as e:
@@ -194,10 +348,16 @@ class UserManagementPage:
         except Exception as e:
             st.error(f"ユーザー一覧取得エラー: {e}")
 
+    @st.fragment
     def _show_user_creation(self):
         """ユーザー新規登録"""
         st.subheader("➕ 新規ユーザー登録")
 
+        # 登録直後の全体再実行で引き継いだ完了メッセージを表示
+        created_message = st.session_state.pop('user_created_message', None)
+        if created_message:
+            st.success(created_message)
+
         with st.form("create_user_form"):
             col1, col2 = st.columns(2)
 
@@ -226,9 +386,11 @@ class UserManagementPage:
                             email=email if email else None,
                             is_admin=is_admin
                         )
+                        _load_users.clear()
 
-                        st.success(f"✅ ユーザー「{full_name}」を登録しました（ID: {user_id}）")
-                        st.balloons()
+                        # ✅ 他タブのユーザー一覧も更新するため全体を再実行
+                        st.session_state['user_created_message'] = f"✅ ユーザー「{full_name}」を登録しました（ID: {user_id}）"
+                        st.rerun()
 
                     except Exception as e:
                         if 'UNIQUE constraint failed' in str(e):
@@ -236,13 +398,12 @@ class UserManagementPage:
                         else:
                             st.error(f"❌ 登録エラー: {e}")
 
-    def _show_role_management(self):
+    @st.fragment
+    def _show_role_management(self, users_df: pd.DataFrame, roles_df: pd.DataFrame):
         """ロール管理"""
         st.subheader("🎭 ロール管理")
 
         try:
-            roles_df = self.auth_service.get_all_roles()
-
             if roles_df.empty:
                 st.info("ロールが登録されていません")
                 return
@@ -262,9 +423,6 @@ class UserManagementPage:
             st.markdown("---")
             st.subheader("👤 ユーザーにロールを割り当て")
 
-            # ユーザー一覧取得
-            users_df = self.auth_service.get_all_users()
-
             if users_df.empty:
                 st.info("ユーザーが登録されていません")
                 return
@@ -272,14 +430,11 @@ class UserManagementPage:
             col1, col2 = st.columns(2)
 
             with col1:
-                user_options = {
-                    f"{row['username']} ({row['full_name']})": row['id']
-                    for _, row in users_df.iterrows()
-                }
+                user_options = _user_options(users_df)
                 selected_user = st.selectbox("ユーザー", options=list(user_options.keys()))
 
             with col2:
-                role_options = {row['role_name']: row['id'] for _, row in roles_df.iterrows()}
+                role_options = _role_options(roles_df)
                 selected_role = st.selectbox("ロール", options=list(role_options.keys()))
 
             col_assign, col_remove = st.columns(2)
@@ -291,6 +446,7 @@ class UserManagementPage:
 
                     try:
                         self.auth_service.assign_role(user_id, role_id)
+                        _load_user_roles_map.clear()
                         st.success(f"✅ {selected_user} に {selected_role} を割り当てました")
                     except Exception as e:
                         st.error(f"❌ 割り当てエラー: {e}")
@@ -302,6 +458,7 @@ class UserManagementPage:
 
                     try:
                         self.auth_service.remove_role(user_id, role_id)
+                        _load_user_roles_map.clear()
                         st.success(f"✅ {selected_user} から {selected_role} を削除しました")
                     except Exception as e:
                         st.error(f"❌ 削除エラー: {e}")
@@ -309,7 +466,8 @@ class UserManagementPage:
             # 現在のロール割り当て状況を表示
             if selected_user:
                 user_id = user_options[selected_user]
-                user_roles = self.auth_service.get_user_roles(user_id)
+                roles_map = _load_user_roles_map(self.auth_service, tuple(int(uid) for uid in users_df['id']))
+                user_roles = roles_map.get(int(user_id), [])
 
                 st.markdown("---")
                 st.write(f"**{selected_user} の現在のロール:**")
@@ -322,124 +480,93 @@ class UserManagementPage:
         except Exception as e:
             st.error(f"ロール管理エラー: {e}")
 
-    def _show_permission_management(self):
+    @st.fragment
+    def _show_permission_management(self, roles_df: pd.DataFrame):
         """権限設定管理"""
         st.subheader("🔐 権限設定")
         st.write("ロールごとにページとタブのアクセス権限を設定します")
 
         try:
-            # ロール一覧取得
-            roles_df = self.auth_service.get_all_roles()
-
             if roles_df.empty:
                 st.info("ロールが登録されていません")
                 return
 
             # ロール選択
-            role_options = {row['role_name']: row['id'] for _, row in roles_df.iterrows()}
+            role_options = _role_options(roles_df)
             selected_role_name = st.selectbox("設定するロール", options=list(role_options.keys()))
             selected_role_id = role_options[selected_role_name]
 
+            # ✅ ページ権限と（選択中ページの）タブ権限を並列に取得しておく
+            tab_page_key = f"tab_page_select_{selected_role_id}"
+            prefetch_page = st.session_state.get(tab_page_key, next(iter(PAGE_TABS)))
+            fu_page_perms = _READ_POOL.submit(_load_page_permissions, self.auth_service, selected_role_id)
+            fu_tab_perms = _READ_POOL.submit(_load_tab_permissions, self.auth_service, selected_role_id, prefetch_page)
+
             st.markdown("---")
 
             # ページ権限設定
             st.subheader("📄 ページ権限")
             st.write("各ページへのアクセス権限を設定します")
 
-            # 利用可能なページ一覧
-            available_pages = [
-                "ダッシュボード",
-                "CSV受注取込",
-                "製品管理",
-                "制限設定",
-                "生産計画",
-                "配送便計画",
-                "納入進度",
-                "📋 出荷指示書",
-                "📦 枚方集荷依頼書",
-                "📅 会社カレンダー",
-                "ユーザー管理",
-                "連絡先管理"
-            ]
-
             # 現在の権限を取得
-            current_page_perms = self.auth_service.get_page_permissions(selected_role_id)
+            current_page_perms = fu_page_perms.result()
             perm_dict = {
                 row['page_name']: {'can_view': bool(row['can_view']), 'can_edit': bool(row['can_edit'])}
                 for _, row in current_page_perms.iterrows()
             } if not current_page_perms.empty else {}
 
+            # ✅ 表示時点の権限と比較し、変更がない保存ではDBに書き込まない
+            initial_pages_df = _permissions_frame(AVAILABLE_PAGES, perm_dict)
+            initial_page_settings = _permission_settings(initial_pages_df)
+
             # ページ権限設定フォーム
             with st.form(f"page_permissions_{selected_role_id}"):
                 st.write("**ページ権限設定:**")
 
-                page_settings = {}
-                for page in available_pages:
-                    col1, col2, col3 = st.columns([3, 1, 1])
-
-                    with col1:
-                        st.write(f"**{page}**")
+                # ✅ チェックボックスを並べず、1つの表で閲覧・編集を設定
+                edited_pages = st.data_editor(
+                    initial_pages_df,
+                    hide_index=True,
+                    num_rows="fixed",
+                    use_container_width=True,
+                    disabled=['name'],
+                    column_config=PERMISSION_COLUMN_CONFIG,
+                    key=f"page_perm_grid_{selected_role_id}"
+                )
+                page_settings = _permission_settings(edited_pages)
 
-                    with col2:
-                        current_view = perm_dict.get(page, {}).get('can_view', False)
-                        can_view = st.checkbox("閲覧", value=current_view, key=f"view_{selected_role_id}_{page}")
+                if st.form_submit_button("💾 ページ権限を保存", type="primary", use_container_width=True):
+                    if page_settings == initial_page_settings:
+                        st.info("ℹ️ 変更がないため保存しませんでした")
+                    else:
+                        try:
+                            save_count = sum(1 for perms in page_settings.values() if perms['can_view'] or perms['can_edit'])
 
-                    with col3:
-                        current_edit = perm_dict.get(page, {}).get('can_edit', False)
-                        can_edit = st.checkbox("編集", value=current_edit, key=f"edit_{selected_role_id}_{page}")
+                            # デバッグ：保存しようとしている内容（DEBUG有効時のみ出力）
+                            if logger.isEnabledFor(logging.DEBUG):
+                                for page, perms in page_settings.items():
+                                    logger.debug(f"設定内容: {page} - 閲覧={perms['can_view']}, 編集={perms['can_edit']}")
 
-                    page_settings[page] = {'can_view': can_view, 'can_edit': can_edit}
+                            if save_count == 0:
+                                logger.warning("チェックが入っているページがありません")
+                                st.warning("⚠️ チェックが入っているページがありません")
 
-                if st.form_submit_button("💾 ページ権限を保存", type="primary", use_container_width=True):
-                    try:
-                        logger.info(f"=== ページ権限保存開始 ===")
-                        logger.info(f"ロール: {selected_role_name} (ID: {selected_role_id})")
-
-                        # デバッグ：保存しようとしている内容をログに出力
-                        save_count = 0
-                        for page, perms in page_settings.items():
-                            logger.info(f"設定内容: {page} - 閲覧={perms['can_view']}, 編集={perms['can_edit']}")
-                            if perms['can_view'] or perms['can_edit']:
-                                save_count += 1
-
-                        if save_count == 0:
-                            logger.warning("チェックが入っているページがありません")
-                            st.warning("⚠️ チェックが入っているページがありません")
-
-                        logger.info(f"合計: {save_count}件のページ権限を設定します")
-
-                        # 既存の権限をすべて削除
-                        logger.info("既存の権限を削除中...")
-                        for page in available_pages:
-                            self.auth_service.delete_page_permission(selected_role_id, page)
-                            logger.debug(f"削除: {page}")
-
-                        # 新しい権限を設定
-                        logger.info("新しい権限を設定中...")
-                        success_count = 0
-                        for page, perms in page_settings.items():
-                            if perms['can_view'] or perms['can_edit']:
-                                logger.info(f"保存開始: role_id={selected_role_id}, page={page}, can_view={perms['can_view']}, can_edit={perms['can_edit']}")
-                                self.auth_service.set_page_permission(
-                                    selected_role_id,
-                                    page,
-                                    perms['can_view'],
-                                    perms['can_edit']
-                                )
-                                success_count += 1
-                                logger.info(f"✓ {page} を設定しました")
+                            # ✅ 対象ページの既存権限削除と新規登録を1トランザクションで実行
+                            success_count = self.auth_service.replace_page_permissions(
+                                selected_role_id,
+                                [(page, perms['can_view'], perms['can_edit']) for page, perms in page_settings.items()]
+                            )
 
-                        logger.info(f"=== ページ権限保存完了: {success_count}件 ===")
-                        st.success(f"✅ {selected_role_name} のページ権限を保存しました（{success_count}件）")
-                        st.balloons()
-                        st.rerun()
-                    except Exception as e:
-                        import traceback
-                        error_detail = traceback.format_exc()
-                        logger.error(f"保存エラー: {e}")
-                        logger.error(f"詳細: {error_detail}")
-                        st.error(f"❌ 保存エラー: {e}")
-                        st.error(f"詳細: {error_detail}")
+                            _load_page_permissions.clear()
+                            logger.info(f"=== ページ権限保存完了: {selected_role_name} (ID: {selected_role_id}) {success_count}件 ===")
+                            st.success(f"✅ {selected_role_name} のページ権限を保存しました（{success_count}件）")
+                        except Exception as e:
+                            import traceback
+                            error_detail = traceback.format_exc()
+                            logger.error(f"保存エラー: {e}")
+                            logger.error(f"詳細: {error_detail}")
+                            st.error(f"❌ 保存エラー: {e}")
+                            st.error(f"詳細: {error_detail}")
 
             st.markdown("---")
 
@@ -447,108 +574,77 @@ class UserManagementPage:
             st.subheader("📑 タブ権限")
             st.write("ロール → ページを選択して、タブごとの閲覧・編集権限を設定します")
 
-            # ページとタブの定義
-            page_tabs = {
-                "生産計画": [
-                    "📊 計画シミュレーション",
-                    "📝 生産計画管理",
-                    "🔧 製造工程（加工対象）"
-                ],
-                "配送便計画": [
-                    "🚛 積載計画",
-                    "📦 出荷管理"
-                ]
-            }
-
             # ページ選択
             selected_page = st.selectbox(
                 "タブ権限を設定するページ",
-                options=list(page_tabs.keys()),
-                key=f"tab_page_select_{selected_role_id}"
+                options=list(PAGE_TABS.keys()),
+                key=tab_page_key
             )
 
-            if selected_page and selected_page in page_tabs:
-                tabs_in_page = page_tabs[selected_page]
+            if selected_page and selected_page in PAGE_TABS:
+                tabs_in_page = PAGE_TABS[selected_page]
 
                 # 現在のタブ権限を取得
-                current_tab_perms = self.auth_service.get_tab_permissions(selected_role_id, selected_page)
+                if selected_page == prefetch_page:
+                    current_tab_perms = fu_tab_perms.result()
+                else:
+                    current_tab_perms = _load_tab_permissions(self.auth_service, selected_role_id, selected_page)
                 tab_perm_dict = {
                     row['tab_name']: {'can_view': bool(row['can_view']), 'can_edit': bool(row['can_edit'])}
                     for _, row in current_tab_perms.iterrows()
                 } if not current_tab_perms.empty else {}
 
+                initial_tabs_df = _permissions_frame(tabs_in_page, tab_perm_dict)
+                initial_tab_settings = _permission_settings(initial_tabs_df)
+
                 # タブ権限設定フォーム
                 with st.form(f"tab_permissions_{selected_role_id}_{selected_page}"):
                     st.write(f"**{selected_page} のタブ権限設定:**")
 
-                    tab_settings = {}
-                    for tab in tabs_in_page:
-                        col1, col2, col3 = st.columns([3, 1, 1])
+                    edited_tabs = st.data_editor(
+                        initial_tabs_df,
+                        hide_index=True,
+                        num_rows="fixed",
+                        use_container_width=True,
+                        disabled=['name'],
+                        column_config=PERMISSION_COLUMN_CONFIG,
+                        key=f"tab_perm_grid_{selected_role_id}_{selected_page}"
+                    )
+                    tab_settings = _permission_settings(edited_tabs)
 
-                        with col1:
-                            st.write(f"**{tab}**")
-
-                        with col2:
-                            current_view = tab_perm_dict.get(tab, {}).get('can_view', False)
-                            can_view = st.checkbox("閲覧", value=current_view, key=f"tab_view_{selected_role_id}_{selected_page}_{tab}")
-
-                        with col3:
-                            current_edit = tab_perm_dict.get(tab, {}).get('can_edit', False)
-                            can_edit = st.checkbox("編集", value=current_edit, key=f"tab_edit_{selected_role_id}_{selected_page}_{tab}")
+                    if st.form_submit_button("💾 タブ権限を保存", type="primary", use_container_width=True):
+                        if tab_settings == initial_tab_settings:
+                            st.info("ℹ️ 変更がないため保存しませんでした")
+                        else:
+                            try:
+                                save_count = sum(1 for perms in tab_settings.values() if perms['can_view'] or perms['can_edit'])
 
-                        tab_settings[tab] = {'can_view': can_view, 'can_edit': can_edit}
+                                # デバッグ：保存しようとしている内容（DEBUG有効時のみ出力）
+                                if logger.isEnabledFor(logging.DEBUG):
+                                    for tab, perms in tab_settings.items():
+                                        logger.debug(f"設定内容: {selected_page} / {tab} - 閲覧={perms['can_view']}, 編集={perms['can_edit']}")
 
-                    if st.form_submit_button("💾 タブ権限を保存", type="primary", use_container_width=True):
-                        try:
-                            logger.info(f"=== タブ権限保存開始 ===")
-                            logger.info(f"ロール: {selected_role_name} (ID: {selected_role_id}), ページ: {selected_page}")
+                                if save_count == 0:
+                                    logger.warning("チェックが入っているタブがありません")
+                                    st.warning("⚠️ チェックが入っているタブがありません")
 
-                            # デバッグ：保存しようとしている内容をログに出力
-                            save_count = 0
-                            for tab, perms in tab_settings.items():
-                                logger.info(f"設定内容: {selected_page} / {tab} - 閲覧={perms['can_view']}, 編集={perms['can_edit']}")
-                                if perms['can_view'] or perms['can_edit']:
-                                    save_count += 1
+                                # ✅ 対象タブの既存権限削除と新規登録を1トランザクションで実行
+                                success_count = self.auth_service.replace_tab_permissions(
+                                    selected_role_id,
+                                    selected_page,
+                                    [(tab, perms['can_view'], perms['can_edit']) for tab, perms in tab_settings.items()]
+                                )
 
-                            if save_count == 0:
-                                logger.warning("チェックが入っているタブがありません")
-                                st.warning("⚠️ チェックが入っているタブがありません")
-
-                            logger.info(f"合計: {save_count}件のタブ権限を設定します")
-
-                            # 既存のタブ権限を削除
-                            logger.info(f"{selected_page}の既存タブ権限を削除中...")
-                            for tab in tabs_in_page:
-                                self.auth_service.delete_tab_permission(selected_role_id, selected_page, tab)
-                                logger.debug(f"削除: {selected_page} / {tab}")
-
-                            # 新しいタブ権限を設定
-                            logger.info("新しいタブ権限を設定中...")
-                            success_count = 0
-                            for tab, perms in tab_settings.items():
-                                if perms['can_view'] or perms['can_edit']:
-                                    logger.info(f"保存開始: role_id={selected_role_id}, page={selected_page}, tab={tab}, can_view={perms['can_view']}, can_edit={perms['can_edit']}")
-                                    self.auth_service.set_tab_permission(
-                                        selected_role_id,
-                                        selected_page,
-                                        tab,
-                                        perms['can_view'],
-                                        perms['can_edit']
-                                    )
-                                    success_count += 1
-                                    logger.info(f"✓ {selected_page} / {tab} を設定しました")
-
-                            logger.info(f"=== タブ権限保存完了: {success_count}件 ===")
-                            st.success(f"✅ {selected_role_name} の {selected_page} タブ権限を保存しました（{success_count}件）")
-                            st.balloons()
-                            st.rerun()
-                        except Exception as e:
-                            import traceback
-                            error_detail = traceback.format_exc()
-                            logger.error(f"保存エラー: {e}")
-                            logger.error(f"詳細: {error_detail}")
-                            st.error(f"❌ 保存エラー: {e}")
-                            st.error(f"詳細: {error_detail}")
+                                _load_tab_permissions.clear()
+                                logger.info(f"=== タブ権限保存完了: {selected_role_name} (ID: {selected_role_id}) / {selected_page} {success_count}件 ===")
+                                st.success(f"✅ {selected_role_name} の {selected_page} タブ権限を保存しました（{success_count}件）")
+                            except Exception as e:
+                                import traceback
+                                error_detail = traceback.format_exc()
+                                logger.error(f"保存エラー: {e}")
+                                logger.error(f"詳細: {error_detail}")
+                                st.error(f"❌ 保存エラー: {e}")
+                                st.error(f"詳細: {error_detail}")
 
         except Exception as e:
             st.error(f"権限設定エラー: {e}")